@@ -1,45 +1,260 @@
 # app/api/routes/scans.py
-from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
+import io
+import os
+import uuid
+import shutil
+import asyncio
+import tempfile
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import APIRouter, BackgroundTasks, Depends, UploadFile, File, Form, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.api import utils  # <-- FIX 1: Use the consistent 'deps' import
 from app.crud import crud_scan
-from app.core.cloudinary_utils import upload_image_to_cloudinary
+from app.core.storage import get_storage
+from app.core.config import settings
+from app.core.image_processing import check_image, normalise_image, InvalidImageError
+from app.core.database import SessionLocal
+from app.core import admission, batch_ingest
+from app.core import tasks
 from app.models import models
 from app.schemas import scan as scan_schema
-from celery_worker import process_scan_image
-from typing import List
+from typing import List, Optional
 router = APIRouter()
 
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+UPLOAD_SPOOL_DIR = settings.SCAN_UPLOAD_SPOOL_DIR or os.path.join(tempfile.gettempdir(), "wastevision_uploads")
+# bounds background normalise + upload + enqueue work, so slow uploads can't take every threadpool thread
+_intake_slots = asyncio.Semaphore(settings.SCAN_INTAKE_CONCURRENCY)
+
 @router.post("/", response_model=scan_schema.ScanJobResponse, status_code=202) # <-- FIX 2: Corrected spelling to ScanJobResponse
-def create_scan(
+async def create_scan(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     latitude: float = Form(...),
     longitude: float = Form(...),
     db: Session = Depends(utils.get_db),
     current_user: models.User = Depends(utils.get_current_user)
 ):
-    job = crud_scan.create_scan_job(db=db, user_id=current_user.id)
+    """
+    Accepts a scan photo and answers 202 as soon as it is spooled to local disk; the
+    upload to storage and the enqueue happen in the background. A failure there marks
+    the job "failed" (see GET /jobs/{job_id}).
+
+    The background step runs in this API process (BackgroundTasks), not on a queue: if
+    the process restarts between the 202 and the enqueue, the spooled file is lost and
+    the job stays "pending".
+    """
+    # validated before it is charged to the rate limit
+    try:
+        await run_in_threadpool(check_image, file.file)
+    except InvalidImageError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await run_in_threadpool(utils.enforce_scan_admission, current_user)
+
+    spool_path = os.path.join(UPLOAD_SPOOL_DIR, f"{uuid.uuid4()}.upload")
+    try:
+        await run_in_threadpool(_spool_upload, file.file, spool_path)
+
+        job = await run_in_threadpool(crud_scan.create_scan_job, db=db, user_id=current_user.id)
+        if not job:
+            raise HTTPException(status_code=500, detail="Could not create scan job")
+
+        background_tasks.add_task(
+            _ingest_scan, spool_path, 
+            job_id=job.id, 
+            latitude=latitude, 
+            longitude=longitude, 
+            user_id=current_user.id, 
+            campus_id=current_user.campus_id
+        )
+    except BaseException:
+        # nothing will pick the spooled file up, and the scan wasn't taken
+        if os.path.exists(spool_path):
+            os.remove(spool_path)
+        utils.refund_scan_admission(current_user, 1)
+        raise
+
+    return {
+        "job_id": job.public_id,
+        "status": "pending",
+        "message": "Scan has been received and is scheduled for processing."
+    }
+
+def _spool_upload(upload, spool_path: str):
+    # our own copy: the request's UploadFile is closed once the response is sent
+    os.makedirs(UPLOAD_SPOOL_DIR, exist_ok=True)
+    upload.seek(0)
+    with open(spool_path, "wb") as spool:
+        shutil.copyfileobj(upload, spool, UPLOAD_CHUNK_BYTES)
+
+async def _ingest_scan(spool_path: str, **scan):
+    async with _intake_slots:
+        await run_in_threadpool(_store_and_enqueue_scan, spool_path, **scan)
+
+def _store_and_enqueue_scan(spool_path: str, job_id: int, latitude: float, longitude: float, user_id: int, campus_id: int):
+    try:
+        with open(spool_path, "rb") as file:
+            # Ingest: rotate / downscale / re-encode before storing, so nothing downstream handles the full-size photo
+            image_data, pixel_scale = normalise_image(file) if settings.INGEST_NORMALISE else (file.read(), 1.0)
+
+            image_url = get_storage().save(image_data, folder="waste_vision_uploads")
+            if not image_url:
+                raise RuntimeError("Could not upload image.")
+
+            if settings.INGEST_NORMALISE and settings.INGEST_KEEP_ORIGINAL:
+                # same name as the normalised upload, in a separate folder
+                file.seek(0)
+                original_name = image_url.rsplit("/", 1)[-1].rsplit(".", 1)[0] or None
+                get_storage().save(file, folder="waste_vision_originals", name=original_name)
+
+        # sent by name so the API never imports the worker / ML code
+        tasks.send_process_scan_image(
+            image_url=image_url,  # <-- FIX 3: Use a clearer parameter name
+            lat=latitude,
+            lon=longitude,
+            job_id=job_id,
+            user_id=user_id, 
+            campus_id=campus_id, 
+            pixel_scale=pixel_scale
+        )
+    except Exception as e:
+        print(f"ERROR: Scan intake failed for job {job_id}: {e}")
+        # the scan never reached the workers: don't count it against the rate limit
+        admission.refund_scan_tokens(user_id, campus_id, 1)
+        db = SessionLocal()
+        try:
+            crud_scan.update_scan_job_status(db, job_id, "failed")
+        finally:
+            db.close()
+    finally:
+        os.remove(spool_path)
+
+@router.get("/jobs/{job_id}", response_model=scan_schema.ScanJobResponse)
+def get_scan_job(
+    job_id: uuid.UUID,
+    db: Session = Depends(utils.get_db),
+    current_user: models.User = Depends(utils.get_current_user)
+):
+    job = crud_scan.get_scan_job(db, public_id=job_id, user_id=current_user.id)
     if not job:
-        raise HTTPException(status_code=500, detail="Could not create scan job")
-
-    upload_result = upload_image_to_cloudinary(file)
-    image_url = upload_result.get("secure_url")
-    if not image_url:
-        raise HTTPException(status_code=500, detail="Could not upload image to Cloudinary.")
-
-    process_scan_image.delay(
-        image_url=image_url,  # <-- FIX 3: Use a clearer parameter name
-        lat=latitude,
-        lon=longitude,
-        job_id=job.id,
+        raise HTTPException(status_code=404, detail="Scan job not found.")
+    return {
+        "job_id": job.public_id,
+        "status": job.status,
+        "message": "Scan could not be stored or queued." if job.status == "failed" else "Scan is being processed."
+    }
+
+def _ingest_batch_image(entry: tuple) -> tuple: 
+    # normalise + upload one image of a batch; returns (name, scan or None, error or None)
+    name, data, latitude, longitude, error = entry
+    if error: 
+        return name, None, error
+    if isinstance(data, bytes): 
+        data = io.BytesIO(data)
+    try: 
+        image_data, pixel_scale = normalise_image(data) if settings.INGEST_NORMALISE else (data.read(), 1.0)
+        image_url = get_storage().save(image_data, folder="waste_vision_uploads")
+    except InvalidImageError as e: 
+        return name, None, str(e)
+    except Exception as e: 
+        print(f"ERROR: Could not upload batch image {name}: {e}")
+        return name, None, "Could not upload image."
+    if not image_url: 
+        return name, None, "Could not upload image."
+    return name, {"image_url": image_url, "lat": latitude, "lon": longitude, "pixel_scale": pixel_scale}, None
+
+@router.post("/batch", response_model=scan_schema.ScanBatchResponse, status_code=202)
+def create_scan_batch(
+    files: List[UploadFile] = File(default=[]),
+    latitudes: List[float] = Form(default=[]),
+    longitudes: List[float] = Form(default=[]),
+    archive: Optional[UploadFile] = File(None),
+    manifest: Optional[str] = Form(None),
+    db: Session = Depends(utils.get_db),
+    current_user: models.User = Depends(utils.get_current_user)
+):
+    """
+    Submits many photos as one scan job: either several `files` with `latitudes` and
+    `longitudes` in the same order, or one zip / tar `archive` plus a coordinates
+    manifest (manifest.json / manifest.csv inside it, or the `manifest` field).
+    Images that can't be used are reported in `rejected`; the rest are processed.
+    """
+    # everything that can be checked up front is, before the images are charged to the
+    # rate limit; images rejected while ingesting are refunded below
+    if archive is not None: 
+        manifest_coords = None
+        try: 
+            image_count = batch_ingest.count_images(archive.file, archive.filename)
+            if manifest: 
+                manifest_name = "manifest.json" if manifest.lstrip().startswith("[") else "manifest.csv"
+                manifest_coords = batch_ingest.parse_manifest(manifest, manifest_name)
+        except batch_ingest.BatchIngestError as e: 
+            raise HTTPException(status_code=400, detail=str(e))
+        if image_count > settings.BATCH_MAX_IMAGES: 
+            raise HTTPException(status_code=400, detail=f"At most {settings.BATCH_MAX_IMAGES} images are accepted per batch.")
+        utils.enforce_scan_admission(current_user, count=image_count)
+        charged = image_count
+        
+        entries = batch_ingest.iter_archive(
+            archive.file, archive.filename, manifest=manifest_coords, 
+            max_images=settings.BATCH_MAX_IMAGES, max_image_bytes=settings.BATCH_MAX_IMAGE_BYTES
+        )
+    else: 
+        if not files: 
+            raise HTTPException(status_code=400, detail="Send image files or an archive.")
+        if len(latitudes) != len(files) or len(longitudes) != len(files): 
+            raise HTTPException(status_code=400, detail="Send one latitude and one longitude per file.")
+        if len(files) > settings.BATCH_MAX_IMAGES: 
+            raise HTTPException(status_code=400, detail=f"At most {settings.BATCH_MAX_IMAGES} images are accepted per batch.")
+        utils.enforce_scan_admission(current_user, count=len(files))
+        charged = len(files)
+        entries = (
+            (file.filename, file.file, latitude, longitude, None) 
+            for file, latitude, longitude in zip(files, latitudes, longitudes)
+        )
+
+    job = None
+    scans, rejected = [], []
+    try: 
+        # images are read a chunk at a time, so at most BATCH_UPLOAD_CONCURRENCY are in memory
+        with ThreadPoolExecutor(max_workers=settings.BATCH_UPLOAD_CONCURRENCY) as executor: 
+            try: 
+                while chunk := list(islice(entries, settings.BATCH_UPLOAD_CONCURRENCY)): 
+                    if job is None: 
+                        job = crud_scan.create_scan_job(db=db, user_id=current_user.id)
+                    for name, scan, error in executor.map(_ingest_batch_image, chunk): 
+                        if scan is None: 
+                            rejected.append({"name": name, "detail": error})
+                        else: 
+                            scans.append(scan)
+            except batch_ingest.BatchIngestError as e: 
+                raise HTTPException(status_code=400, detail=str(e))
+    finally: 
+        # only the accepted images count against the rate limit
+        utils.refund_scan_admission(current_user, charged - len(scans))
+
+    if not scans: 
+        if job is not None: 
+            job.status = "failed"
+            db.commit()
+        raise HTTPException(status_code=400, detail={"message": "No usable images in the batch.", "rejected": rejected})
+
+    # one message per BATCH_TASK_SIZE images; the worker infers each message as one batch
+    tasks.send_process_scan_batch(
+        scans, 
+        job_id=job.id, 
         user_id=current_user.id, 
-        campus_id=current_user.campus_id 
+        campus_id=current_user.campus_id
     )
 
     return {
         "job_id": job.public_id,
         "status": "pending",
-        "message": "Scan has been received and is scheduled for processing."
+        "message": f"{len(scans)} images have been received and are scheduled for processing.",
+        "accepted": len(scans),
+        "rejected": rejected
     }
     
 @router.get("/results", response_model=List[scan_schema.ScanResultResponse])
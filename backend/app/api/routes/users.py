@@ -8,7 +8,7 @@ from app.schemas import user as user_schema
 # app/api/routes/users.py
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
 # ... other imports
-from app.core.cloudinary_utils import upload_image_to_cloudinary
+from app.core.storage import get_storage
 from app.crud import crud_user
 
 router = APIRouter()
@@ -31,9 +31,8 @@ def upload_profile_image(
     """
     Uploads a profile image for the current user.
     """
-    # 1. Upload the image to Cloudinary
-    upload_result = upload_image_to_cloudinary(file)
-    image_url = upload_result.get("secure_url")
+    # 1. Upload the image to storage (Cloudinary, or local files)
+    image_url = get_storage().save(file, folder="waste_vision_uploads")
     if not image_url:
         raise HTTPException(status_code=500, detail="Could not upload image.")
 
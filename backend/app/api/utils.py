@@ -3,7 +3,7 @@ from fastapi import Depends, HTTPException, status
 from jose import jwt, JWTError
 from sqlalchemy.orm import Session
 
-from app.core import security
+from app.core import admission, security
 from app.core.config import settings
 from app.crud import crud_user
 from app.models import models
@@ -46,3 +46,20 @@ def get_current_user(
     if user is None:
         raise credential_exception
     return user
+
+
+
+def enforce_scan_admission(current_user: models.User, count: int = 1):
+    # 429 with Retry-After when the workers are too far behind or the user / campus is over its rate
+    retry_after = admission.admit_scans(current_user.id, current_user.campus_id, count)
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Scan processing is busy. Please retry later.",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+def refund_scan_admission(current_user: models.User, count: int):
+    # gives back the rate limit tokens of images rejected after enforce_scan_admission
+    admission.refund_scan_tokens(current_user.id, current_user.campus_id, count)
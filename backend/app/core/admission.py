@@ -0,0 +1,202 @@
+# app/core/admission.py
+import time
+import statistics
+
+from app.core import metrics, tasks
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+# Admission control for scan intake.
+#
+# Two independent checks, both answered with a Retry-After in seconds (None = admit):
+#   - backlog: the Celery queues in Redis are deeper than ADMISSION_MAX_QUEUE_DEPTH,
+#     or, while there is a backlog at all, recent scans took longer than
+#     ADMISSION_MAX_LATENCY_SECONDS from submission to stored result (workers report it
+#     via record_scan_latency);
+#   - rate: token buckets per user and per campus, refilled continuously, where each
+#     submitted image costs one token.
+# Redis being unreachable never blocks intake: the checks fail open.
+
+LATENCY_KEY = "wastevision:admission:latencies"
+RATE_KEY_PREFIX = "wastevision:ratelimit:"
+# recent end-to-end latencies kept for the median, and how long they count after the last scan
+LATENCY_SAMPLES = 100
+LATENCY_TTL_SECONDS = 600
+# the queue check is shared by all requests of this process for this long
+QUEUE_CHECK_CACHE_SECONDS = 1.0
+
+# Token buckets for all KEYS, checked and charged atomically: either every bucket has
+# `cost` tokens and all are charged, or none is. ARGV = cost, then rate (tokens/s) and
+# burst for each key. Returns 0, or the seconds until the emptiest bucket can pay.
+TOKEN_BUCKET_SCRIPT = """
+local cost = tonumber(ARGV[1])
+local clock = redis.call("TIME")
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local tokens, wait = {}, 0
+for i, key in ipairs(KEYS) do
+    local rate, burst = tonumber(ARGV[i * 2]), tonumber(ARGV[i * 2 + 1])
+    local state = redis.call("HMGET", key, "tokens", "ts")
+    local available = tonumber(state[1]) or burst
+    local elapsed = math.max(0, now - (tonumber(state[2]) or now))
+    available = math.min(burst, available + elapsed * rate)
+    tokens[i] = available
+    if available < cost then
+        wait = math.max(wait, (cost - available) / rate)
+    end
+end
+for i, key in ipairs(KEYS) do
+    local rate, burst = tonumber(ARGV[i * 2]), tonumber(ARGV[i * 2 + 1])
+    local remaining = tokens[i]
+    if wait == 0 then
+        remaining = remaining - cost
+    end
+    redis.call("HSET", key, "tokens", remaining, "ts", now)
+    redis.call("EXPIRE", key, math.ceil(burst / rate) + 1)
+end
+return tostring(wait)
+"""
+
+# Gives `count` tokens back to each bucket in KEYS (never above its burst, from ARGV
+# after count), for images that were charged for but then rejected.
+REFUND_TOKENS_SCRIPT = """
+local count = tonumber(ARGV[1])
+for i, key in ipairs(KEYS) do
+    local burst = tonumber(ARGV[i + 1])
+    local tokens = tonumber(redis.call("HGET", key, "tokens"))
+    if tokens then
+        redis.call("HSET", key, "tokens", math.min(burst, tokens + math.min(count, burst)))
+    end
+end
+return 0
+"""
+
+_queue_check = (0.0, None, None)  # (checked_at, retry_after, reason)
+_token_bucket = None
+_refund_tokens = None
+
+
+def scan_queues() -> list:
+    queues = [tasks.celery_app.conf.task_default_queue]
+    if settings.SCAN_PIPELINE_MODE == "staged":
+        queues += [tasks.IO_QUEUE, tasks.CPU_QUEUE]
+    return queues
+
+
+def record_scan_latency(seconds: float):
+    """
+    Called by the worker once a scan's result is stored, with the time since submission.
+    """
+    metrics.SCAN_END_TO_END_SECONDS.observe(seconds)
+    try:
+        with get_redis().pipeline() as pipe:
+            pipe.lpush(LATENCY_KEY, seconds)
+            pipe.ltrim(LATENCY_KEY, 0, LATENCY_SAMPLES - 1)
+            pipe.expire(LATENCY_KEY, LATENCY_TTL_SECONDS)
+            pipe.execute()
+    except Exception as e:
+        print(f"⚠️ Could not record scan latency: {e}")
+
+
+def recent_latency() -> float | None:
+    samples = get_redis().lrange(LATENCY_KEY, 0, -1)
+    return statistics.median(float(sample) for sample in samples) if samples else None
+
+
+def _retry_after(latency: float | None) -> int:
+    # a backlog takes about one scan latency to drain past the threshold
+    return int(min(max(latency or settings.ADMISSION_RETRY_AFTER_SECONDS, 1), settings.ADMISSION_MAX_RETRY_AFTER_SECONDS))
+
+
+def check_backlog() -> tuple:
+    """
+    (retry_after, reason): (None, None) to admit, else the Retry-After in seconds and
+    why ("queue_depth" or "latency").
+    """
+    global _queue_check
+    checked_at, retry_after, reason = _queue_check
+    if time.monotonic() - checked_at < QUEUE_CHECK_CACHE_SECONDS:
+        return retry_after, reason
+
+    try:
+        client = get_redis()
+        with client.pipeline(transaction=False) as pipe:
+            for queue in scan_queues():
+                pipe.llen(queue)
+            depth = sum(pipe.execute())
+        latency = recent_latency()
+    except Exception as e:
+        print(f"⚠️ Admission check failed, admitting: {e}")
+        return None, None
+
+    retry_after, reason = None, None
+    if depth >= settings.ADMISSION_MAX_QUEUE_DEPTH:
+        retry_after, reason = _retry_after(latency), "queue_depth"
+    elif depth and latency is not None and latency >= settings.ADMISSION_MAX_LATENCY_SECONDS:
+        # only with work queued: the samples outlive the backlog (nothing new is admitted
+        # to replace them), and empty queues mean new scans won't wait
+        retry_after, reason = _retry_after(latency), "latency"
+    _queue_check = (time.monotonic(), retry_after, reason)
+    return retry_after, reason
+
+
+def _scan_buckets(user_id: int, campus_id: int | None) -> list:
+    # (key, tokens per minute, burst) for each bucket a scan is charged to
+    buckets = [(f"user:{user_id}", settings.RATE_LIMIT_USER_PER_MINUTE, settings.RATE_LIMIT_USER_BURST)]
+    if campus_id is not None:
+        buckets.append((f"campus:{campus_id}", settings.RATE_LIMIT_CAMPUS_PER_MINUTE, settings.RATE_LIMIT_CAMPUS_BURST))
+    return buckets
+
+
+def take_scan_tokens(user_id: int, campus_id: int | None, count: int = 1) -> int | None:
+    global _token_bucket
+    buckets = _scan_buckets(user_id, campus_id)
+    # a request may never cost more than a full bucket, or it could never be admitted
+    cost = min([count] + [burst for _, _, burst in buckets])
+
+    args = [cost]
+    for _, per_minute, burst in buckets:
+        args += [per_minute / 60.0, burst]
+    try:
+        if _token_bucket is None:
+            _token_bucket = get_redis().register_script(TOKEN_BUCKET_SCRIPT)
+        wait = float(_token_bucket(keys=[RATE_KEY_PREFIX + key for key, _, _ in buckets], args=args))
+    except Exception as e:
+        print(f"⚠️ Rate limit check failed, admitting: {e}")
+        return None
+
+    if wait <= 0:
+        return None
+    metrics.ADMISSION_REJECTIONS.labels(reason="rate_limit").inc()
+    return max(int(wait + 0.999), 1)
+
+
+def refund_scan_tokens(user_id: int, campus_id: int | None, count: int):
+    """
+    Returns tokens taken by admit_scans for images that were then rejected (invalid
+    image, missing coordinates, ...), so bad submissions don't drain the buckets.
+    """
+    global _refund_tokens
+    if not settings.RATE_LIMIT_ENABLED or count <= 0:
+        return
+    buckets = _scan_buckets(user_id, campus_id)
+    try:
+        if _refund_tokens is None:
+            _refund_tokens = get_redis().register_script(REFUND_TOKENS_SCRIPT)
+        _refund_tokens(keys=[RATE_KEY_PREFIX + key for key, _, _ in buckets], args=[count] + [burst for _, _, burst in buckets])
+    except Exception as e:
+        print(f"⚠️ Could not refund rate limit tokens: {e}")
+
+
+def admit_scans(user_id: int, campus_id: int | None, count: int = 1) -> int | None:
+    """
+    Returns None if `count` new scan images may be accepted, else a Retry-After in seconds.
+    """
+    if settings.ADMISSION_ENABLED:
+        retry_after, reason = check_backlog()
+        if retry_after is not None:
+            # per rejected request, including those answered from the cached check
+            metrics.ADMISSION_REJECTIONS.labels(reason=reason).inc()
+            return retry_after
+    if settings.RATE_LIMIT_ENABLED:
+        return take_scan_tokens(user_id, campus_id, count)
+    return None
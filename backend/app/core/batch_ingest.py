@@ -0,0 +1,103 @@
+# app/core/batch_ingest.py
+import io
+import csv
+import json
+import os
+import tarfile
+import zipfile
+from typing import BinaryIO, Iterator
+
+# Batch scan submissions (POST /api/scans/batch): pulling images and their
+# coordinates out of a zip / tar archive.
+#
+# Uploads arrive as spooled temporary files (on disk past a small threshold), so
+# archives are read member by member from there; only one image's bytes are in
+# memory at a time. Coordinates come from a manifest, either a manifest.json /
+# manifest.csv inside the archive or one passed alongside it:
+#     [{"file": "IMG_001.jpg", "latitude": 12.97, "longitude": 77.59}, ...]
+#     file,latitude,longitude
+#     IMG_001.jpg,12.97,77.59
+
+MANIFEST_NAMES = ("manifest.json", "manifest.csv")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".heic", ".bmp", ".tif", ".tiff")
+
+
+class BatchIngestError(ValueError):
+    pass
+
+
+def parse_manifest(data: bytes | str, name: str = "manifest.json") -> dict:
+    """
+    Returns {file name: (latitude, longitude)} from a JSON or CSV manifest. Names are
+    matched on their base name, so archives may keep images in sub-folders.
+    """
+    if isinstance(data, bytes):
+        data = data.decode("utf-8-sig")
+    try:
+        if name.lower().endswith(".csv"):
+            rows = list(csv.DictReader(io.StringIO(data)))
+        else:
+            rows = json.loads(data)
+        return {
+            os.path.basename(str(row["file"])): (float(row["latitude"]), float(row["longitude"]))
+            for row in rows
+        }
+    except (ValueError, KeyError, TypeError) as e:
+        raise BatchIngestError(f"Invalid manifest '{name}': {e}")
+
+
+def _is_image(name: str) -> bool:
+    return name.lower().endswith(IMAGE_EXTENSIONS) and not os.path.basename(name).startswith(".")
+
+
+def _open_archive(fileobj: BinaryIO, filename: str) -> tuple:
+    # returns (file members, name_of, size_of, read) for a zip or tar archive
+    if zipfile.is_zipfile(fileobj):
+        fileobj.seek(0)
+        archive = zipfile.ZipFile(fileobj)
+        members = [info for info in archive.infolist() if not info.is_dir()]
+        return members, lambda m: m.filename, lambda m: m.file_size, archive.read
+
+    fileobj.seek(0)
+    try:
+        archive = tarfile.open(fileobj=fileobj, mode="r:*")
+    except tarfile.TarError:
+        raise BatchIngestError(f"'{filename}' is not a zip or tar archive.")
+    members = [member for member in archive.getmembers() if member.isfile()]
+    return members, lambda m: m.name, lambda m: m.size, lambda m: archive.extractfile(m).read()
+
+
+def count_images(fileobj: BinaryIO, filename: str) -> int:
+    members, name_of, _, _ = _open_archive(fileobj, filename)
+    return sum(1 for member in members if _is_image(name_of(member)))
+
+
+def iter_archive(fileobj: BinaryIO, filename: str, manifest: dict | None = None,
+                 max_images: int = 500, max_image_bytes: int = 25 * 1024 * 1024) -> Iterator[tuple]:
+    """
+    Yields (name, image bytes, latitude, longitude, error) for each image in a zip or
+    tar archive, in archive order. error is None, or says why the image was skipped
+    (not in the manifest, or larger than max_image_bytes once extracted) in which
+    case the bytes and coordinates are None.
+    """
+    members, name_of, size_of, read = _open_archive(fileobj, filename)
+
+    if manifest is None:
+        manifest_member = next((m for m in members if os.path.basename(name_of(m)).lower() in MANIFEST_NAMES), None)
+        if manifest_member is None:
+            raise BatchIngestError(f"'{filename}' has no manifest.json / manifest.csv and none was sent.")
+        manifest = parse_manifest(read(manifest_member), name_of(manifest_member))
+
+    images = [member for member in members if _is_image(name_of(member))]
+    if len(images) > max_images:
+        raise BatchIngestError(f"'{filename}' has {len(images)} images; at most {max_images} are accepted per batch.")
+
+    for member in images:
+        name = os.path.basename(name_of(member))
+        coords = manifest.get(name)
+        if coords is None:
+            yield name, None, None, None, "No coordinates for this image in the manifest."
+        elif size_of(member) > max_image_bytes:
+            yield name, None, None, None, f"Image is larger than {max_image_bytes} bytes."
+        else:
+            yield name, read(member), coords[0], coords[1], None
@@ -1,6 +1,7 @@
 import cloudinary
 import cloudinary.uploader
-from fastapi import UploadFile
+# FastAPI hands routes starlette UploadFile instances (fastapi.UploadFile subclasses it)
+from starlette.datastructures import UploadFile
 from app.core.config import settings
 
 cloudinary.config(
@@ -10,10 +11,11 @@ cloudinary.config(
     secure=True
 )
 
-def upload_image_to_cloudinary(file: UploadFile) -> dict:
+def upload_image_to_cloudinary(file: UploadFile | bytes, folder: str = "waste_vision_uploads", **options) -> dict:
     """
-    Uploads an image file to Cloudinary and returns the response.
+    Uploads an image file (an UploadFile or already-encoded bytes) to Cloudinary and returns the response.
     """
+    data = file.file if isinstance(file, UploadFile) else file
     # The folder parameter is optional but helps organize uploads in Cloudinary
-    result = cloudinary.uploader.upload(file.file, folder="waste_vision_uploads")
+    result = cloudinary.uploader.upload(data, folder=folder, **options)
     return result
\ No newline at end of file
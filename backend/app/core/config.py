@@ -17,9 +17,90 @@ class Settings(BaseSettings):
     
     
     REDIS_URL: str
-    CLOUDINARY_CLOUD_NAME: str
-    CLOUDINARY_API_KEY: str
-    CLOUDINARY_API_SECRET: str
+    # image storage (app/core/storage.py): "cloudinary", or "local" files under
+    # STORAGE_LOCAL_ROOT served at STORAGE_PUBLIC_BASE_URL (Cloudinary keys not needed then)
+    STORAGE_BACKEND: str = "cloudinary"
+    STORAGE_LOCAL_ROOT: str = "media"
+    STORAGE_PUBLIC_BASE_URL: str = "http://localhost:8000/media"
+    CLOUDINARY_CLOUD_NAME: str = ""
+    CLOUDINARY_API_KEY: str = ""
+    CLOUDINARY_API_SECRET: str = ""
+    
+    # worker: "memory" decodes downloads in RAM, "file" keeps the temp-file path
+    WORKER_IMAGE_MODE: str = "memory"
+    
+    # scan ingest: uploads are EXIF-rotated, downscaled and re-encoded before storage
+    INGEST_NORMALISE: bool = True
+    INGEST_MAX_EDGE: int = 1280
+    # the worker's tiled inference (see ml/config.py) only tiles images of at least
+    # ML_TILE_MIN_EDGE px; while it is on, ingest keeps that much resolution instead
+    ML_TILED_INFERENCE: bool = False
+    ML_TILE_MIN_EDGE: int = 1600
+    INGEST_FORMAT: str = "JPEG"  # "JPEG" or "WEBP"
+    INGEST_QUALITY: int = 85
+    INGEST_KEEP_ORIGINAL: bool = False
+    # POST /api/scans/ answers 202 once the upload is spooled here; normalise, storage
+    # upload and enqueue then run in the background, at most SCAN_INTAKE_CONCURRENCY at once
+    SCAN_UPLOAD_SPOOL_DIR: str = ""
+    SCAN_INTAKE_CONCURRENCY: int = 8
+    
+    # batch submissions (POST /api/scans/batch): images per request, parallel
+    # normalise + upload threads, and images per worker task (one inference batch)
+    BATCH_MAX_IMAGES: int = 500
+    BATCH_MAX_IMAGE_BYTES: int = 25 * 1024 * 1024
+    BATCH_UPLOAD_CONCURRENCY: int = 8
+    BATCH_TASK_SIZE: int = 16
+    
+    # scan flow: "single" runs one process_scan_image task per scan; "staged" chains
+    # fetch (scans.io) -> infer (scans.cpu) -> persist (scans.db), see app/core/tasks.py
+    SCAN_PIPELINE_MODE: str = "single"
+    # where the fetch stage leaves decoded images for the infer stage (must be shared
+    # by the I/O and CPU workers); defaults to /dev/shm when available
+    SCAN_SPOOL_DIR: str = ""
+    # which work this worker does: "all", "io", "cpu" or "db" (only "all"/"cpu" load the model)
+    WORKER_ROLE: str = "all"
+    # "immediate" commits each scan result on its own; "buffered" batches results for up to
+    # SCAN_BUFFER_MAX_SECONDS or SCAN_BUFFER_MAX_ROWS and writes them (plus the affected
+    # zones' statuses) in one transaction
+    SCAN_PERSIST_MODE: str = "immediate"
+    SCAN_BUFFER_MAX_ROWS: int = 100
+    SCAN_BUFFER_MAX_SECONDS: float = 2.0
+    # "immediate" updates the zone's total with every result; "coalesced" collects
+    # per-zone deltas in Redis and applies them at most once per ZONE_UPDATE_INTERVAL_SECONDS
+    ZONE_UPDATE_MODE: str = "immediate"
+    ZONE_UPDATE_INTERVAL_SECONDS: float = 5.0
+    
+    # image downloads (app/core/http_client.py): pooled keep-alive connections, timeouts
+    # in seconds, retries with exponential backoff, and a per-download size cap
+    HTTP_POOL_SIZE: int = 16
+    HTTP_CONNECT_TIMEOUT: float = 3.05
+    HTTP_READ_TIMEOUT: float = 20.0
+    HTTP_MAX_RETRIES: int = 3
+    HTTP_BACKOFF_FACTOR: float = 0.5
+    HTTP_MAX_DOWNLOAD_BYTES: int = 25 * 1024 * 1024
+    
+    # scan results are stored idempotently (one per job + image URL), so tasks can be
+    # acked only after they finish and retried on transient DB / Redis / network errors
+    CELERY_ACKS_LATE: bool = True
+    SCAN_TASK_MAX_RETRIES: int = 3
+    
+    # scan intake admission control (app/core/admission.py): 429 + Retry-After while the
+    # queues are deeper than / scans take longer than these, and per-user / per-campus
+    # token buckets (one token per image)
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_MAX_QUEUE_DEPTH: int = 1000
+    ADMISSION_MAX_LATENCY_SECONDS: float = 300.0
+    ADMISSION_RETRY_AFTER_SECONDS: int = 30
+    ADMISSION_MAX_RETRY_AFTER_SECONDS: int = 300
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_USER_PER_MINUTE: float = 120.0
+    RATE_LIMIT_USER_BURST: int = 500
+    RATE_LIMIT_CAMPUS_PER_MINUTE: float = 1200.0
+    RATE_LIMIT_CAMPUS_BURST: int = 2000
+    
+    # Prometheus /metrics port for the Celery worker (0 disables). Off by default: every
+    # worker on a host needs its own, e.g. one port per WORKER_ROLE in the staged pipeline
+    WORKER_METRICS_PORT: int = 0
     
     
     class Config: 
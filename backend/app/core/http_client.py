@@ -0,0 +1,116 @@
+# app/core/http_client.py
+import os
+import asyncio
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from app.core.config import settings
+
+# Shared HTTP client for fetching scan images.
+#
+# One requests.Session per process keeps TLS connections to the image host alive
+# between tasks, with connect/read timeouts, bounded retries with exponential
+# backoff on connection errors and 429/5xx, and a cap on how many bytes a single
+# download may return. A session is never shared across a fork: pool children
+# each build their own on first use.
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+CHUNK_SIZE = 64 * 1024
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+class ImageTooLargeError(ValueError):
+    pass
+
+
+def _build_session() -> requests.Session:
+    retry = Retry(
+        total=settings.HTTP_MAX_RETRIES,
+        backoff_factor=settings.HTTP_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=("GET", "HEAD"),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=settings.HTTP_POOL_SIZE,
+        pool_maxsize=settings.HTTP_POOL_SIZE,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    global _session, _session_pid
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            _session = _build_session()
+            _session_pid = os.getpid()
+        return _session
+
+
+def _timeout() -> tuple:
+    return (settings.HTTP_CONNECT_TIMEOUT, settings.HTTP_READ_TIMEOUT)
+
+
+def iter_content(url: str, max_bytes: int | None = None):
+    """
+    Streams the body of a GET in chunks; raises requests exceptions on HTTP / network
+    errors and ImageTooLargeError once more than max_bytes have been received.
+    """
+    max_bytes = max_bytes or settings.HTTP_MAX_DOWNLOAD_BYTES
+    with get_session().get(url, stream=True, timeout=_timeout()) as response:
+        response.raise_for_status()
+        declared = response.headers.get("Content-Length")
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            raise ImageTooLargeError(f"{url} is {int(declared)} bytes (limit {max_bytes}).")
+
+        received = 0
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            received += len(chunk)
+            if received > max_bytes:
+                raise ImageTooLargeError(f"{url} exceeded the {max_bytes} byte limit.")
+            yield chunk
+
+
+def fetch_bytes(url: str, max_bytes: int | None = None) -> bytes:
+    return b"".join(iter_content(url, max_bytes=max_bytes))
+
+
+def fetch_to_file(url: str, path: str, max_bytes: int | None = None) -> str:
+    try:
+        with open(path, "wb") as f:
+            for chunk in iter_content(url, max_bytes=max_bytes):
+                f.write(chunk)
+    except Exception:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return path
+
+
+async def fetch_bytes_async(url: str, max_bytes: int | None = None) -> bytes:
+    # the pooled session is thread-safe for plain GETs, so overlapping downloads share it
+    return await asyncio.to_thread(fetch_bytes, url, max_bytes)
+
+
+async def fetch_many(urls: list, concurrency: int = 8, max_bytes: int | None = None) -> list:
+    """
+    Downloads urls concurrently (at most `concurrency` at once). Returns one entry per
+    url, in order: the bytes, or the exception that download raised.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(url):
+        async with semaphore:
+            return await fetch_bytes_async(url, max_bytes=max_bytes)
+
+    return await asyncio.gather(*(fetch(url) for url in urls), return_exceptions=True)
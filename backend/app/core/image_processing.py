@@ -0,0 +1,70 @@
+# app/core/image_processing.py
+import io
+from typing import BinaryIO
+from PIL import Image, ImageOps, UnidentifiedImageError
+from app.core.config import settings
+
+# Pillow format name -> file extension / content type
+INGEST_FORMATS = {
+    "JPEG": ("jpg", "image/jpeg"),
+    "WEBP": ("webp", "image/webp"),
+}
+
+# with the worker's tiled inference on, downscaling below its threshold would make it unreachable
+INGEST_MAX_EDGE = (
+    max(settings.INGEST_MAX_EDGE, settings.ML_TILE_MIN_EDGE) if settings.ML_TILED_INFERENCE else settings.INGEST_MAX_EDGE
+)
+
+class InvalidImageError(ValueError):
+    pass
+
+def check_image(file: BinaryIO): 
+    """
+    Cheap up-front check that an upload is an image Pillow can open: reads the
+    header only, and rewinds the file afterwards.
+    """
+    try: 
+        Image.open(file)
+    except (UnidentifiedImageError, OSError) as e: 
+        raise InvalidImageError(f"Could not decode uploaded image: {e}")
+    finally: 
+        file.seek(0)
+
+def normalise_image(
+    file: BinaryIO, 
+    max_edge: int = INGEST_MAX_EDGE, 
+    image_format: str = settings.INGEST_FORMAT, 
+    quality: int = settings.INGEST_QUALITY
+) -> tuple: 
+    """
+    Decodes an uploaded image, applies its EXIF orientation, downscales it so the
+    longest edge is at most max_edge (INGEST_MAX_EDGE, raised to ML_TILE_MIN_EDGE when
+    the worker tiles large images) and re-encodes it as JPEG/WebP.
+    The model only needs ~640-1280 px, so everything downstream (storage, worker
+    download, decode) handles a fraction of the original bytes.
+    
+    Returns (image bytes, pixel_scale), pixel_scale being original pixels per stored
+    pixel (1.0 when not downscaled). The worker needs it to measure boxes in the
+    original photo's pixels, which is what reconstruction's PIXEL_TO_CM is calibrated for.
+    """
+    image_format = image_format.upper()
+    if image_format not in INGEST_FORMATS: 
+        raise ValueError(f"Unsupported ingest format '{image_format}'.")
+    
+    try: 
+        image = Image.open(file)
+        original_edge = max(image.size)
+        # let the JPEG decoder scale down by a power of two while decoding (much cheaper than a full decode)
+        image.draft("RGB", (max_edge, max_edge))
+        image = ImageOps.exif_transpose(image)
+    except (UnidentifiedImageError, OSError) as e: 
+        raise InvalidImageError(f"Could not decode uploaded image: {e}")
+    
+    if image.mode != "RGB": 
+        image = image.convert("RGB")
+    # thumbnail only ever shrinks, keeping the aspect ratio
+    image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+    
+    output = io.BytesIO()
+    image.save(output, format=image_format, quality=quality, optimize=image_format == "JPEG")
+    return output.getvalue(), original_edge / max(image.size)
@@ -0,0 +1,154 @@
+# app/core/metrics.py
+import os
+import time
+from contextlib import contextmanager
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+    generate_latest, multiprocess, start_http_server
+)
+
+# Prometheus metrics for scan processing (worker) and request latency (API).
+#
+# Celery prefork and multi-worker uvicorn run several processes; set
+# PROMETHEUS_MULTIPROC_DIR to an empty, writable directory so every process
+# writes its samples there and each exposition aggregates all of them. The
+# Celery worker sets up a private one by itself when WORKER_METRICS_PORT is set.
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+SCAN_STAGE_SECONDS = Histogram(
+    "wastevision_scan_stage_seconds", 
+    "Time spent in each stage of scan processing.", 
+    ["stage"], 
+    buckets=STAGE_BUCKETS
+)
+SCANS_PROCESSED = Counter(
+    "wastevision_scans_processed_total", 
+    "Scan images processed to completion."
+)
+SCAN_FAILURES = Counter(
+    "wastevision_scan_failures_total", 
+    "Scan images that could not be processed.", 
+    ["reason"]
+)
+SCAN_DUPLICATES = Counter(
+    "wastevision_scan_duplicates_total", 
+    "Scan results skipped because the same job and image were already stored (task replays)."
+)
+SCAN_EMPTY_DETECTIONS = Counter(
+    "wastevision_scan_empty_detections_total", 
+    "Scan images in which no waste was detected."
+)
+SCAN_UNMATCHED_ZONES = Counter(
+    "wastevision_scan_unmatched_zones_total", 
+    "Scan images whose coordinates matched no zone."
+)
+
+# Clean-image pre-filter (ML_PREFILTER_*, see ml/pipeline.py). Hit rate is
+# skipped / checked; time saved is roughly
+#   skipped * detection_seconds / detection_runs - prefilter_seconds
+PREFILTER_CHECKED = Counter(
+    "wastevision_prefilter_checked_total", 
+    "Images scored by the low-resolution clean-image pre-filter."
+)
+PREFILTER_SKIPPED = Counter(
+    "wastevision_prefilter_skipped_total", 
+    "Images the pre-filter judged clean, skipping full detection."
+)
+PREFILTER_SECONDS = Counter(
+    "wastevision_prefilter_seconds_total", 
+    "Time spent in the pre-filter pass."
+)
+DETECTION_RUNS = Counter(
+    "wastevision_detection_runs_total", 
+    "Images run through full detection."
+)
+DETECTION_SECONDS = Counter(
+    "wastevision_detection_seconds_total", 
+    "Time spent in full detection."
+)
+PREFILTER_THRESHOLD = Gauge(
+    "wastevision_prefilter_threshold", 
+    "Pre-filter confidence threshold (images scoring below it skip detection); 0 when disabled.", 
+    multiprocess_mode="max"
+)
+
+SCAN_END_TO_END_SECONDS = Histogram(
+    "wastevision_scan_end_to_end_seconds", 
+    "Time from scan submission to stored result.", 
+    buckets=STAGE_BUCKETS + (120.0, 300.0, 900.0, 3600.0)
+)
+ADMISSION_REJECTIONS = Counter(
+    "wastevision_admission_rejections_total", 
+    "Scan submissions answered with 429.", 
+    ["reason"]
+)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "wastevision_http_request_duration_seconds", 
+    "API request latency.", 
+    ["method", "route", "status"]
+)
+
+
+@contextmanager
+def time_stage(stage: str): 
+    started = time.perf_counter()
+    try: 
+        yield
+    finally: 
+        SCAN_STAGE_SECONDS.labels(stage=stage).observe(time.perf_counter() - started)
+
+
+def observe_stage(stage: str, seconds: float): 
+    SCAN_STAGE_SECONDS.labels(stage=stage).observe(seconds)
+
+
+_exported_prefilter = {}
+
+def export_prefilter_stats(stats: dict): 
+    """
+    Brings the pre-filter metrics up to date with this process's cumulative
+    pipeline.prefilter_stats() (the ml package doesn't depend on Prometheus).
+    """
+    PREFILTER_THRESHOLD.set(stats["threshold"] if stats["enabled"] else 0)
+    for key, counter in (
+        ("checked", PREFILTER_CHECKED), 
+        ("skipped", PREFILTER_SKIPPED), 
+        ("prefilter_seconds", PREFILTER_SECONDS), 
+        ("detections_run", DETECTION_RUNS), 
+        ("detection_seconds", DETECTION_SECONDS), 
+    ): 
+        delta = stats[key] - _exported_prefilter.get(key, 0)
+        if delta > 0: 
+            counter.inc(delta)
+        _exported_prefilter[key] = stats[key]
+
+
+def _registry(): 
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"): 
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def render_metrics() -> tuple: 
+    """
+    Returns (body, content type) for a /metrics response.
+    """
+    return generate_latest(_registry()), CONTENT_TYPE_LATEST
+
+
+def start_metrics_server(port: int): 
+    """
+    Serves /metrics on its own port (used by the Celery worker, which has no HTTP app).
+    """
+    start_http_server(port, registry=_registry())
+    print(f"📈 Metrics served on :{port}/metrics")
+
+
+def mark_process_dead(pid: int): 
+    # drop a finished process's live gauges in multiprocess mode
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"): 
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,16 @@
+# app/core/redis_client.py
+import redis
+from app.core.config import settings
+
+# One lazily created Redis client per process (redis-py pools connections internally),
+# for app-level state that lives next to the Celery broker: coalesced zone updates,
+# admission control and rate limits.
+
+_redis = None
+
+
+def get_redis() -> redis.Redis:
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis.from_url(settings.REDIS_URL)
+    return _redis
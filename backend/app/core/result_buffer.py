@@ -0,0 +1,77 @@
+# app/core/result_buffer.py
+import time
+import threading
+
+
+class ResultBuffer:
+    """
+    Collects rows and hands them to flush_rows(rows) in batches: as soon as max_rows
+    are waiting, or max_seconds after the oldest waiting row arrived, whichever comes
+    first. Call flush() on shutdown to write whatever is still buffered.
+
+    If flush_rows raises, the rows are kept and retried with the next batch.
+    """
+
+    def __init__(self, flush_rows, max_rows: int = 100, max_seconds: float = 2.0):
+        self.flush_rows = flush_rows
+        self.max_rows = max_rows
+        self.max_seconds = max_seconds
+        self._rows = []
+        self._oldest_at = None
+        self._lock = threading.Lock()
+        # serialises flushes so rows are written in order and never twice
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def add(self, row: dict):
+        with self._lock:
+            self._ensure_timer()
+            if not self._rows:
+                self._oldest_at = time.monotonic()
+            self._rows.append(row)
+            full = len(self._rows) >= self.max_rows
+        if full:
+            self.flush()
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+                self._oldest_at = None
+            if not rows:
+                return 0
+            try:
+                self.flush_rows(rows)
+            except Exception:
+                with self._lock:
+                    self._rows = rows + self._rows
+                    self._oldest_at = time.monotonic()
+                raise
+            return len(rows)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._rows)
+
+    def _ensure_timer(self):
+        # started lazily so it lives in the process that buffers (after a prefork fork)
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._flush_periodically, name="result-buffer", daemon=True)
+            self._thread.start()
+
+    def _flush_periodically(self):
+        while True:
+            with self._lock:
+                oldest_at = self._oldest_at
+            wait = self.max_seconds if oldest_at is None else oldest_at + self.max_seconds - time.monotonic()
+            if wait > 0:
+                self._wakeup.wait(wait)
+                self._wakeup.clear()
+                continue
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️ Buffered flush of {self.pending()} rows failed, will retry: {e}")
+                self._wakeup.wait(self.max_seconds)
+                self._wakeup.clear()
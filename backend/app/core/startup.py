@@ -0,0 +1,39 @@
+# app/core/startup.py
+import sys
+import time
+
+# Modules the API process should never need; if any of these show up in sys.modules
+# something on the route import path is pulling in the ML stack.
+HEAVY_MODULES = ("torch", "ultralytics", "cv2", "pandas", "ml.pipeline", "celery_worker")
+
+def _peak_rss_mb() -> float | None: 
+    try: 
+        import resource
+    except ImportError:  # not available on Windows
+        return None
+    # ru_maxrss is KB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+def report_import_cost(started_at: float) -> dict: 
+    """
+    Prints how long the app took to import and how much memory it holds, and
+    warns if any heavy ML module got imported. `started_at` is a time.perf_counter()
+    value taken at the top of app/main.py.
+    """
+    elapsed = time.perf_counter() - started_at
+    rss_mb = _peak_rss_mb()
+    loaded_heavy = [name for name in HEAVY_MODULES if name in sys.modules]
+    
+    rss_text = f"{rss_mb:.0f} MB peak RSS" if rss_mb is not None else "RSS unavailable"
+    print(f"🚦 API imports took {elapsed:.2f}s, {len(sys.modules)} modules, {rss_text}.")
+    if loaded_heavy: 
+        print(f"⚠️ Heavy modules loaded in the API process: {', '.join(loaded_heavy)}. "
+              f"Run `python -X importtime -c 'import app.main'` to find the import path.")
+    
+    return {
+        "import_seconds": elapsed, 
+        "module_count": len(sys.modules), 
+        "peak_rss_mb": rss_mb, 
+        "heavy_modules": loaded_heavy, 
+    }
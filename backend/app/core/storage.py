@@ -0,0 +1,120 @@
+# app/core/storage.py
+import os
+import mmap
+import uuid
+import hashlib
+from abc import ABC, abstractmethod
+from typing import BinaryIO
+
+from starlette.datastructures import UploadFile
+
+from app.core.config import settings
+
+# Image storage behind one interface, picked with STORAGE_BACKEND:
+#   "cloudinary" - uploads to Cloudinary (the default), served from its CDN
+#   "local"      - a local or shared filesystem under STORAGE_LOCAL_ROOT, served by the
+#                  API under STORAGE_PUBLIC_BASE_URL (see app/main.py). Files are
+#                  content-addressed: <folder>/<sha[:2]>/<sha[2:4]>/<sha256>.<ext>, so
+#                  re-uploads are free and a co-located worker can map a URL straight
+#                  back to the file instead of downloading it.
+
+# leading bytes -> file extension for the formats we accept
+MAGIC_EXTENSIONS = (
+    (b"\xff\xd8\xff", "jpg"),
+    (b"\x89PNG", "png"),
+    (b"RIFF", "webp"),
+    (b"BM", "bmp"),
+)
+
+
+def _read_all(data: UploadFile | BinaryIO | bytes) -> bytes:
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return bytes(data)
+    if isinstance(data, UploadFile):
+        data = data.file
+    return data.read()
+
+
+def _extension(data: bytes) -> str:
+    for magic, extension in MAGIC_EXTENSIONS:
+        if data.startswith(magic):
+            return extension
+    return "bin"
+
+
+class ImageStorage(ABC):
+
+    @abstractmethod
+    def save(self, data: UploadFile | BinaryIO | bytes, folder: str, name: str | None = None) -> str | None:
+        """
+        Stores an image and returns its public URL (None if the upload failed).
+        """
+
+    def local_path(self, url: str) -> str | None:
+        """
+        Path of the stored file behind url, if this process can read it directly.
+        """
+        return None
+
+
+class CloudinaryStorage(ImageStorage):
+
+    def save(self, data, folder, name=None):
+        from app.core.cloudinary_utils import upload_image_to_cloudinary
+        options = {"public_id": name} if name else {}
+        return upload_image_to_cloudinary(data, folder=folder, **options).get("secure_url")
+
+
+class LocalStorage(ImageStorage):
+
+    def __init__(self, root: str, base_url: str):
+        self.root = os.path.abspath(root)
+        self.base_url = base_url.rstrip("/")
+
+    def save(self, data, folder, name=None):
+        # name is ignored: the content hash is the name
+        data = _read_all(data)
+        digest = hashlib.sha256(data).hexdigest()
+        relative = f"{folder}/{digest[:2]}/{digest[2:4]}/{digest}.{_extension(data)}"
+        path = os.path.join(self.root, *relative.split("/"))
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # write-then-rename so readers never see a partial file
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return f"{self.base_url}/{relative}"
+
+    def local_path(self, url):
+        if not url.startswith(self.base_url + "/"):
+            return None
+        path = os.path.abspath(os.path.join(self.root, url[len(self.base_url) + 1:]))
+        # never resolve outside the storage root
+        if not path.startswith(self.root + os.sep) or not os.path.isfile(path):
+            return None
+        return path
+
+
+def map_file(path: str) -> mmap.mmap:
+    """
+    Read-only memory map of a stored file: usable wherever bytes are (hashing, cv2
+    decoding) without copying it into the process. Closed when garbage collected.
+    """
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+_storage = None
+
+
+def get_storage() -> ImageStorage:
+    global _storage
+    if _storage is None:
+        if settings.STORAGE_BACKEND == "local":
+            _storage = LocalStorage(settings.STORAGE_LOCAL_ROOT, settings.STORAGE_PUBLIC_BASE_URL)
+        elif settings.STORAGE_BACKEND == "cloudinary":
+            _storage = CloudinaryStorage()
+        else:
+            raise ValueError(f"Unknown storage backend '{settings.STORAGE_BACKEND}'. Expected 'cloudinary' or 'local'.")
+    return _storage
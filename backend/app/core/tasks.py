@@ -0,0 +1,96 @@
+# app/core/tasks.py
+import time
+from celery import Celery, chain
+from app.core.config import settings
+
+# Thin task-signature module: the API enqueues work by task *name* through this
+# Celery client, so it never imports celery_worker (and with it ultralytics,
+# torch and the model weights). celery_worker.py registers the tasks under the
+# same names on this same app.
+
+celery_app = Celery(
+    "tasks", 
+    broker=settings.REDIS_URL, 
+    backend=settings.REDIS_URL
+)
+
+# --- task names ---
+PROCESS_SCAN_IMAGE = "celery_worker.process_scan_image"
+# many images of one job in one message, inferred as one batch
+PROCESS_SCAN_BATCH = "celery_worker.process_scan_batch"
+
+# Staged scan pipeline (SCAN_PIPELINE_MODE="staged"): each stage runs on its own queue
+# so network waits never hold a CPU slot. Stages hand off small dicts; the image itself
+# stays on the spool filesystem (see celery_worker.spool_image).
+FETCH_SCAN_IMAGE = "celery_worker.fetch_scan_image"
+INFER_SCAN_IMAGE = "celery_worker.infer_scan_image"
+PERSIST_SCAN_RESULT = "celery_worker.persist_scan_result"
+
+# Debounced zone total update (ZONE_UPDATE_MODE="coalesced", see app/core/zone_updates.py)
+FLUSH_ZONE_UPDATES = "celery_worker.flush_zone_updates"
+
+IO_QUEUE = "scans.io"     # download + decode: high concurrency (threads), e.g. -P threads -c 32
+CPU_QUEUE = "scans.cpu"   # inference: one prefork process per core
+DB_QUEUE = "scans.db"     # persistence: a few threads
+
+celery_app.conf.task_routes = {
+    FETCH_SCAN_IMAGE: {"queue": IO_QUEUE}, 
+    INFER_SCAN_IMAGE: {"queue": CPU_QUEUE}, 
+    PERSIST_SCAN_RESULT: {"queue": DB_QUEUE}, 
+}
+if settings.SCAN_PIPELINE_MODE == "staged": 
+    # batches download, infer and persist in one task: mostly inference, so the CPU workers take them
+    celery_app.conf.task_routes[PROCESS_SCAN_BATCH] = {"queue": CPU_QUEUE}
+    celery_app.conf.task_routes[FLUSH_ZONE_UPDATES] = {"queue": DB_QUEUE}
+# results are written idempotently (see crud_scan.create_scan_result), so a task may
+# safely run twice: ack it only once it has finished, and requeue it if its worker dies
+celery_app.conf.task_acks_late = settings.CELERY_ACKS_LATE
+celery_app.conf.task_reject_on_worker_lost = settings.CELERY_ACKS_LATE
+# inference tasks are long; don't let one CPU process hoard queued work while others idle
+celery_app.conf.worker_prefetch_multiplier = 1
+
+
+def send_process_scan_image(image_url: str, lat: float, lon: float, job_id: int, user_id: int, campus_id: int, 
+                            pixel_scale: float = 1.0): 
+    scan = {
+        "image_url": image_url, 
+        "lat": lat, 
+        "lon": lon, 
+        "job_id": job_id, 
+        "user_id": user_id, 
+        "campus_id": campus_id, 
+        # original / stored image size, from ingest downscaling (app/core/image_processing.py)
+        "pixel_scale": pixel_scale, 
+        # end-to-end latency feeds admission control (app/core/admission.py)
+        "submitted_at": time.time(), 
+    }
+    if settings.SCAN_PIPELINE_MODE == "staged": 
+        # each stage's return value is passed to the next one
+        return chain(
+            celery_app.signature(FETCH_SCAN_IMAGE, kwargs=scan), 
+            celery_app.signature(INFER_SCAN_IMAGE), 
+            celery_app.signature(PERSIST_SCAN_RESULT), 
+        ).apply_async()
+    return celery_app.send_task(PROCESS_SCAN_IMAGE, kwargs=scan)
+
+
+def send_process_scan_batch(scans: list, job_id: int, user_id: int, campus_id: int) -> list: 
+    """
+    Enqueues a batch submission as ceil(len(scans) / BATCH_TASK_SIZE) tasks, so each
+    worker runs a full inference batch and large batches spread over workers.
+    scans: [{"image_url": ..., "lat": ..., "lon": ..., "pixel_scale": ...}, ...]
+    """
+    size = max(settings.BATCH_TASK_SIZE, 1)
+    return [
+        celery_app.send_task(
+            PROCESS_SCAN_BATCH, 
+            kwargs={
+                "scans": scans[start:start + size], 
+                "job_id": job_id, 
+                "user_id": user_id, 
+                "campus_id": campus_id, 
+                "submitted_at": time.time(), 
+            }
+        )
+        for start in range(0, len(scans), size)
+    ]
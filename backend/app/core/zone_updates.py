@@ -0,0 +1,97 @@
+# app/core/zone_updates.py
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+# Coalesced zone updates (ZONE_UPDATE_MODE="coalesced").
+#
+# Instead of updating the zone row on every scan, workers add the scan's volume to a
+# per-zone Redis hash of pending deltas and mark the zone dirty. A debounced
+# flush_zone_updates task (see celery_worker.py) then applies each dirty zone's summed
+# delta with one crud_logic.add_zone_waste call, so a burst of photos of the same area
+# costs one UPDATE per interval instead of one per photo. Totals, and so statuses,
+# end up exactly as if every scan had been applied individually.
+#
+# A scan's delta is recorded once per stored result (mark_result_dirty): the result
+# row is committed first and its delta is recorded after, so a task that fails in
+# between is retried, finds its row and records the delta again, and an "applied"
+# marker per result id makes every repeat a no-op.
+
+DIRTY_ZONES_KEY = "wastevision:zones:dirty"
+DELTA_KEY_PREFIX = "wastevision:zones:delta:"
+FLUSH_SCHEDULED_KEY = "wastevision:zones:flush_scheduled"
+APPLIED_KEY_PREFIX = "wastevision:zones:applied:"
+# how long a result's marker outlives it: longer than any task retry / redelivery
+APPLIED_TTL_SECONDS = 24 * 3600
+
+# KEYS = applied marker, zone delta hash, dirty zone set, flush flag;
+# ARGV = zone id, volume, scans, marker TTL, flush flag TTL. Records the delta only
+# if the marker wasn't set yet; returns 1 if the caller should schedule a flush.
+MARK_RESULT_SCRIPT = """
+if redis.call("SET", KEYS[1], 1, "NX", "EX", ARGV[4]) then
+    redis.call("HINCRBYFLOAT", KEYS[2], "volume", ARGV[2])
+    redis.call("HINCRBY", KEYS[2], "scans", ARGV[3])
+    redis.call("SADD", KEYS[3], ARGV[1])
+end
+if redis.call("SET", KEYS[4], 1, "NX", "EX", ARGV[5]) then
+    return 1
+end
+return 0
+"""
+
+_mark_result = None
+
+
+def _flush_flag_ttl() -> int: 
+    # the expiry only matters if a scheduled flush task is lost: the next scan reschedules
+    return max(int(settings.ZONE_UPDATE_INTERVAL_SECONDS * 10), 60)
+
+
+def mark_zone_dirty(zone_id: int, waste_volume: float, scans: int = 1) -> bool:
+    """
+    Records a pending delta for the zone. Returns True if the caller should schedule
+    a flush (none is pending yet for this interval).
+    """
+    client = get_redis()
+    with client.pipeline() as pipe:
+        pipe.hincrbyfloat(DELTA_KEY_PREFIX + str(zone_id), "volume", waste_volume or 0.0)
+        pipe.hincrby(DELTA_KEY_PREFIX + str(zone_id), "scans", scans)
+        pipe.sadd(DIRTY_ZONES_KEY, zone_id)
+        pipe.execute()
+    return bool(client.set(FLUSH_SCHEDULED_KEY, 1, nx=True, ex=_flush_flag_ttl()))
+
+
+def mark_result_dirty(result_id: int, zone_id: int, waste_volume: float) -> bool: 
+    """
+    mark_zone_dirty for one stored scan result, at most once per result id however
+    often it is called. Returns True if the caller should schedule a flush.
+    """
+    global _mark_result
+    if _mark_result is None: 
+        _mark_result = get_redis().register_script(MARK_RESULT_SCRIPT)
+    return bool(_mark_result(
+        keys=[APPLIED_KEY_PREFIX + str(result_id), DELTA_KEY_PREFIX + str(zone_id), DIRTY_ZONES_KEY, FLUSH_SCHEDULED_KEY], 
+        args=[zone_id, waste_volume or 0.0, 1, APPLIED_TTL_SECONDS, _flush_flag_ttl()]
+    ))
+
+
+def pop_dirty_zones() -> dict:
+    """
+    Takes every pending delta: returns {zone_id: (volume, scans)}. Deltas recorded
+    while this runs either make it into the result or stay for the next flush.
+    """
+    client = get_redis()
+    # clear the flag first, so a scan arriving from here on schedules the next flush
+    client.delete(FLUSH_SCHEDULED_KEY)
+
+    pending = {}
+    while True:
+        zone_ids = client.spop(DIRTY_ZONES_KEY, 500)
+        if not zone_ids:
+            return pending
+        for zone_id in zone_ids:
+            with client.pipeline() as pipe:
+                pipe.hgetall(DELTA_KEY_PREFIX + zone_id.decode())
+                pipe.delete(DELTA_KEY_PREFIX + zone_id.decode())
+                delta, _ = pipe.execute()
+            if delta:
+                pending[int(zone_id)] = (float(delta[b"volume"]), int(delta[b"scans"]))
@@ -1,20 +1,67 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, case, update
 from app.models import models
 from datetime import datetime, timezone
 RED_THRESHOLD_CM3 = 30000
 YELLOW_THRESHOLD_CM3 = 10000
 
+def add_zone_waste(db: Session, zone_id: int, waste_volume: float, scans: int = 1, commit: bool = True): 
+    """
+    Adds new scan volume to the zone's running total and re-derives its status in a
+    single atomic UPDATE ... RETURNING: constant time however long the zone's history,
+    and concurrent workers can't overwrite each other's totals.
+    
+    Returns the zone's new (total, status), or None if the zone doesn't exist.
+    """
+    new_total = models.Zone.total_waste_volume + (waste_volume or 0.0)
+    row = db.execute(
+        update(models.Zone).where(
+            models.Zone.id == zone_id
+        ).values(
+            # every right-hand side sees the row's values from before this UPDATE
+            total_waste_volume=new_total, 
+            scan_count=models.Zone.scan_count + scans, 
+            last_waste_score=new_total, 
+            current_status=_status_case(new_total), 
+            last_scanned_at=datetime.now(timezone.utc)
+        ).returning(
+            models.Zone.zone_code, models.Zone.total_waste_volume, models.Zone.current_status
+        )
+    ).first()
+    if commit: 
+        db.commit()
+    if row is None: 
+        return None
+    
+    print(f"Updating Zone {row.zone_code}: Total Waste = {row.total_waste_volume: .2f} cm3, New Status = {row.current_status}")
+    return row.total_waste_volume, row.current_status
+
+def zone_status_for_total(total_waste: float) -> str: 
+    if total_waste >= RED_THRESHOLD_CM3: 
+        return "Red"
+    if total_waste >= YELLOW_THRESHOLD_CM3: 
+        return "Yellow"
+    return "Green"
+
+def _status_case(total): 
+    # SQL twin of zone_status_for_total
+    return case(
+        (total >= RED_THRESHOLD_CM3, "Red"), 
+        (total >= YELLOW_THRESHOLD_CM3, "Yellow"), 
+        else_="Green"
+    )
+
 def update_zone_status(db: Session, zone_id: int): 
-    # aggregate of the waste vol for a comppleted scan job, sums the waste, and gets the zone object 
+    # full recompute from every stored result (the per-scan path is add_zone_waste);
+    # also rebuilds the zone's running total and count
     print(f"Recalculating total waste for zone ID: {zone_id}")
     
     # This query sums ALL waste results for the given zone_id
-    total_waste_result = db.query(
-        func.sum(models.ScanResult.waste_volume_estimate)
+    total_waste_result, scan_count = db.query(
+        func.sum(models.ScanResult.waste_volume_estimate), func.count(models.ScanResult.id)
     ).filter(
         models.ScanResult.zone_id == zone_id
-    ).scalar()
+    ).one()
     
     # if no results yet, sum will be None. Default to 0
     total_waste = total_waste_result or 0.0
@@ -24,18 +71,44 @@ def update_zone_status(db: Session, zone_id: int):
     if not zone:
         return
     
- 
-    new_status = "Green"
-    if total_waste >= RED_THRESHOLD_CM3: 
-        new_status = "Red"
-    elif total_waste >= YELLOW_THRESHOLD_CM3: 
-        new_status = "Yellow"
-        
-    zone.current_status = new_status
-    zone.last_waste_score = total_waste
-    zone.last_scanned_at = datetime.now(timezone.utc)
+    new_status = _apply_zone_total(zone, total_waste, scan_count)
     db.commit()
     
     print(f"Updating Zone {zone.zone_code}: Total Waste = {total_waste: .2f} cm3, New Status = {new_status}")
-        
-    db.commit()
\ No newline at end of file
+
+def update_zone_statuses(db: Session, zone_ids=None, commit: bool = True) -> int: 
+    """
+    Same as update_zone_status for several zones (all zones if zone_ids is None): one
+    grouped SUM/COUNT query, one zone query, and (optionally) one commit. Used to
+    reconcile the running totals; returns the number of zones updated.
+    """
+    results = db.query(
+        models.ScanResult.zone_id, 
+        func.sum(models.ScanResult.waste_volume_estimate), 
+        func.count(models.ScanResult.id)
+    ).group_by(models.ScanResult.zone_id)
+    zones = db.query(models.Zone)
+    if zone_ids is not None: 
+        results = results.filter(models.ScanResult.zone_id.in_(zone_ids))
+        zones = zones.filter(models.Zone.id.in_(zone_ids))
+    totals = {zone_id: (total, count) for zone_id, total, count in results.all()}
+    
+    updated = 0
+    for zone in zones.all(): 
+        total_waste, scan_count = totals.get(zone.id, (0.0, 0))
+        _apply_zone_total(zone, total_waste or 0.0, scan_count, touch=False)
+        updated += 1
+    if commit: 
+        db.commit()
+    print(f"Updated status of {updated} zones.")
+    return updated
+
+def _apply_zone_total(zone: models.Zone, total_waste: float, scan_count: int, touch: bool = True) -> str: 
+    new_status = zone_status_for_total(total_waste)
+    zone.current_status = new_status
+    zone.last_waste_score = total_waste
+    zone.total_waste_volume = total_waste
+    zone.scan_count = scan_count
+    if touch: 
+        zone.last_scanned_at = datetime.now(timezone.utc)
+    return new_status
\ No newline at end of file
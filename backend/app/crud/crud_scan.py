@@ -1,3 +1,4 @@
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session, joinedload
 from app.models import models
 from datetime import datetime, timezone
@@ -10,18 +11,69 @@ def create_scan_job(db: Session, user_id: int) -> models.ScanJob:
     db.refresh(new_job)
     return new_job
 
-def create_scan_result(db: Session, job_id: int, zone_id: int, image_url: str, waste_volume_estimate: float): 
-    new_result = models.ScanResult(
-        job_id=job_id, 
-        zone_id=zone_id, 
-        image_url=image_url, 
-        waste_volume_estimate=waste_volume_estimate, 
-        processed_at = datetime.now(timezone.utc)
-    )
-    
-    db.add(new_result)
+def update_scan_job_status(db: Session, job_id: int, status: str): 
+    db.query(models.ScanJob).filter(models.ScanJob.id == job_id).update({"status": status})
     db.commit()
-    return new_result
+
+def get_scan_job(db: Session, public_id, user_id: int) -> models.ScanJob | None: 
+    return db.query(models.ScanJob).filter(
+        models.ScanJob.public_id == public_id, 
+        models.ScanJob.user_id == user_id
+    ).first()
+
+def _insert_ignoring_duplicates(db: Session): 
+    # INSERT ... ON CONFLICT DO NOTHING on the (job_id, image_url) idempotency key
+    insert = sqlite.insert if db.get_bind().dialect.name == "sqlite" else postgresql.insert
+    return insert(models.ScanResult).on_conflict_do_nothing(index_elements=["job_id", "image_url"])
+
+def create_scan_result(db: Session, job_id: int, zone_id: int, image_url: str, waste_volume_estimate: float, 
+                       model_version: str | None = None, commit: bool = True) -> int | None: 
+    """
+    Stores one scan result, unless this job already has a result for image_url (a
+    retried or redelivered task). Returns the new row's id, or None for a replay.
+    """
+    new_result_id = db.execute(
+        _insert_ignoring_duplicates(db).values(
+            job_id=job_id, 
+            zone_id=zone_id, 
+            image_url=image_url, 
+            waste_volume_estimate=waste_volume_estimate, 
+            model_version=model_version, 
+            processed_at=datetime.now(timezone.utc)
+        ).returning(models.ScanResult.id)
+    ).scalar()
+    
+    if commit: 
+        db.commit()
+    return new_result_id
+
+def get_scan_result(db: Session, job_id: int, image_url: str) -> models.ScanResult | None: 
+    return db.query(models.ScanResult).filter(
+        models.ScanResult.job_id == job_id, 
+        models.ScanResult.image_url == image_url
+    ).first()
+
+def create_scan_results_bulk(db: Session, rows: List[dict], commit: bool = True) -> List[dict]: 
+    """
+    Inserts many scan results in a single executemany. Each row has the keyword
+    arguments of create_scan_result (processed_at is filled in if missing); rows
+    already stored for their job and image_url are skipped. Returns the rows that
+    were actually inserted.
+    """
+    if not rows: 
+        return []
+    now = datetime.now(timezone.utc)
+    # one row per key, so duplicates within the batch can't be reported as inserted twice
+    rows = list({(row["job_id"], row["image_url"]): row for row in rows}.values())
+    inserted_keys = set(db.execute(
+        _insert_ignoring_duplicates(db).returning(
+            models.ScanResult.job_id, models.ScanResult.image_url
+        ), 
+        [{"processed_at": now, "model_version": None, **row} for row in rows]
+    ).all())
+    if commit: 
+        db.commit()
+    return [row for row in rows if (row["job_id"], row["image_url"]) in inserted_keys]
 
 def get_scan_results_for_campus(db: Session, campus_id: int, limit: int = 50) -> List[models.ScanResult]:
     """
@@ -1,9 +1,18 @@
-from fastapi import FastAPI
+import os
+import time
+_import_started = time.perf_counter()
+from urllib.parse import urlparse
+
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.staticfiles import StaticFiles
 
 from app.api.routes import auth, zones, locations, campuses, users, scans
 from app.core.database import Base, engine   # 👈 use new database.py
 from app.models import models  # 👈 ensure models are imported so tables get registered
+from app.core.startup import report_import_cost
+from app.core import metrics
+from app.core.config import settings
 
 
 # Create all tables
@@ -27,6 +36,24 @@ app.add_middleware(
 )
 
 
+# Request latency metrics, labelled by route template (not raw path) to keep cardinality bounded
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        metrics.HTTP_REQUEST_SECONDS.labels(
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(status),
+        ).observe(time.perf_counter() - started)
+
+
 # Register routers
 app.include_router(campuses.router, prefix="/api/campuses", tags=["Campuses"])
 app.include_router(users.router, prefix="/api/users", tags=["Users"])
@@ -35,6 +62,23 @@ app.include_router(zones.router, prefix="/api/zones", tags=["Map & Zones"])
 app.include_router(locations.router, prefix="/api", tags=['Locations'])
 app.include_router(scans.router, prefix="/api/scans", tags=['Locations'])
 
+# Local image storage: serve stored files at STORAGE_PUBLIC_BASE_URL's path
+if settings.STORAGE_BACKEND == "local":
+    os.makedirs(settings.STORAGE_LOCAL_ROOT, exist_ok=True)
+    app.mount(
+        urlparse(settings.STORAGE_PUBLIC_BASE_URL).path.rstrip("/") or "/media",
+        StaticFiles(directory=settings.STORAGE_LOCAL_ROOT),
+        name="media",
+    )
+
 @app.get("/")
 def read_root():
-    return {"message": "Welcome to the Waste Management API!"}
\ No newline at end of file
+    return {"message": "Welcome to the Waste Management API!"}
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    body, content_type = metrics.render_metrics()
+    return Response(content=body, media_type=content_type)
+
+# Startup-time report of import cost (time, memory, heavy ML modules pulled in)
+IMPORT_REPORT = report_import_cost(_import_started)
\ No newline at end of file
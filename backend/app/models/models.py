@@ -58,6 +58,9 @@ class Zone(Base):
     current_status = Column(String(10), nullable=False, default='Green')
     last_waste_score = Column(Integer, default=0)
     last_scanned_at = Column(TIMESTAMP, nullable=True)
+    # running aggregates of the zone's scan results, kept by crud_logic.add_zone_waste
+    total_waste_volume = Column(Float, nullable=False, default=0.0, server_default="0")
+    scan_count = Column(Integer, nullable=False, default=0, server_default="0")
 
     campus = relationship("Campus", back_populates="zones")
 
@@ -81,8 +84,12 @@ class ScanResult(Base):
     zone_id = Column(Integer, ForeignKey("zones.id"), nullable=False)
     image_url = Column(String(512), nullable=False)
     waste_volume_estimate = Column(Float, nullable=True)
+    model_version = Column(String(64), nullable=True)
     processed_at = Column(TIMESTAMP, default=datetime.now(timezone.utc))
     
+    # idempotency key: a redelivered / retried task must not store the same image twice
+    __table_args__ = (UniqueConstraint('job_id', 'image_url', name='_job_image_uc'),)
+    
     job = relationship("ScanJob", back_populates="results")
     zone = relationship("Zone")
     
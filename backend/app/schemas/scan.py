@@ -1,6 +1,7 @@
 # app/schemas/scan.py
 import uuid
 from datetime import datetime
+from typing import List, Optional
 from pydantic import BaseModel
 from . import zone as zone_schema # Import the zone schemas
 
@@ -9,10 +10,19 @@ class ScanJobResponse(BaseModel):
     status: str
     message: str
 
+class RejectedImage(BaseModel):
+    name: str
+    detail: str
+
+class ScanBatchResponse(ScanJobResponse):
+    accepted: int
+    rejected: List[RejectedImage] = []
+
 # ADD THIS NEW SCHEMA
 class ScanResultResponse(BaseModel):
     image_url: str
     waste_volume_estimate: float
+    model_version: Optional[str] = None
     processed_at: datetime
     zone: zone_schema.MapZone # Nest the full zone object
 
@@ -0,0 +1,39 @@
+import argparse
+import sys
+from pathlib import Path
+
+script_dir = Path(__file__).resolve().parent
+backend_dir = script_dir.parent.parent
+sys.path.append(str(backend_dir))
+
+from app.models import models
+from app.core.database import SessionLocal
+from app.crud import crud_logic
+
+# Rebuilds every zone's running waste total, scan count and status from its stored
+# scan results. Workers only ever add to the running totals (crud_logic.add_zone_waste),
+# so run this after deleting or editing scan results, or after restoring a backup.
+#
+# Usage (from backend/):
+#     python app/scripts/reconcile_zone_totals.py
+#     python app/scripts/reconcile_zone_totals.py --campus-public-id <uuid>
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild zone waste totals from scan results.")
+    parser.add_argument("--campus-public-id", default=None, help="Only reconcile this campus's zones.")
+    args = parser.parse_args()
+
+    db_session = SessionLocal()
+    try:
+        zone_ids = None
+        if args.campus_public_id:
+            campus = db_session.query(models.Campus).filter(models.Campus.public_id == args.campus_public_id).first()
+            if not campus:
+                sys.exit(f"ERROR: Campus with public_id '{args.campus_public_id}' not found")
+            zone_ids = [zone.id for zone in db_session.query(models.Zone.id).filter(models.Zone.campus_id == campus.id)]
+
+        print("Reconciling zone totals...")
+        updated = crud_logic.update_zone_statuses(db_session, zone_ids)
+        print(f"Reconciled {updated} zones.")
+    finally:
+        db_session.close()
@@ -1,94 +1,593 @@
 import os
-import requests
 import uuid
+import time
+import atexit
+import shutil
+import asyncio
+import numpy as np
+import redis
+import requests
+from sqlalchemy.exc import OperationalError
 from pathlib import Path
-from celery import Celery
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown
 import sys
+import tempfile
 
 backend_dir = Path(__file__).resolve().parent
 sys.path.append(str(backend_dir))
 
 
 from app.core.config import settings
+
+# Tasks run in the pool children, so the /metrics the parent serves must aggregate
+# their samples. Unless PROMETHEUS_MULTIPROC_DIR is configured, give this worker a
+# fresh directory of its own, removed when it exits. This has to happen before
+# prometheus_client is imported (it picks its storage at import time).
+if settings.WORKER_METRICS_PORT and not os.environ.get("PROMETHEUS_MULTIPROC_DIR"): 
+    _metrics_dir = tempfile.mkdtemp(prefix="wastevision-worker-metrics-")
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = _metrics_dir
+    _metrics_dir_owner = os.getpid()
+    # pool children inherit the atexit hook; only the process that made the directory removes it
+    atexit.register(lambda: os.getpid() == _metrics_dir_owner and shutil.rmtree(_metrics_dir, ignore_errors=True))
+
 from app.core.database import SessionLocal
-from ml.pipeline import process_waste_image
+from app.core.tasks import (
+    celery_app, PROCESS_SCAN_IMAGE, PROCESS_SCAN_BATCH, FETCH_SCAN_IMAGE, INFER_SCAN_IMAGE, PERSIST_SCAN_RESULT, 
+    FLUSH_ZONE_UPDATES
+)
+from app.core import admission, http_client, metrics, storage, zone_updates
+from app.core.result_buffer import ResultBuffer
+from ml import pipeline
+from ml.config import ml_settings
+from ml.pipeline import process_waste_image, process_waste_images
+from ml.detection import decode_image
+from ml import cache as inference_cache
 from app.crud import crud_zone, crud_scan, crud_logic
 
 
-celery_app = Celery(
-    "tasks", 
-    broker=settings.REDIS_URL, 
-    backend=settings.REDIS_URL
-)
+@worker_init.connect
+def preload_model(**kwargs): 
+    # runs once in the parent before the pool forks; children inherit the weights copy-on-write
+    if ml_settings.PRELOAD_IN_PARENT and _loads_model(): 
+        pipeline.preload_model_for_fork()
+
+@worker_init.connect
+def start_metrics(**kwargs): 
+    # the parent serves /metrics, aggregating all pool children from PROMETHEUS_MULTIPROC_DIR (set above)
+    if settings.WORKER_METRICS_PORT: 
+        metrics.start_metrics_server(settings.WORKER_METRICS_PORT)
+
+@worker_process_shutdown.connect
+def cleanup_metrics(pid=None, **kwargs): 
+    metrics.mark_process_dead(pid or os.getpid())
+
+@worker_process_shutdown.connect
+def flush_buffered_results(**kwargs): 
+    # pool children exit through here; atexit (below) covers solo/threads pools
+    _flush_result_buffer()
+
+def _loads_model() -> bool: 
+    # I/O and DB workers of the staged pipeline never run inference
+    return settings.WORKER_ROLE in ("all", "cpu")
+
+@worker_process_init.connect
+def init_model(**kwargs): 
+    if not _loads_model(): 
+        return
+    # each pool child loads (if not inherited) and warms up the model before taking tasks;
+    # get_model also starts the registry watcher (for solo / threads pools, on the first task)
+    pipeline.get_model()
+    print(f"WORKER: Model ready in child {os.getpid()}: {pipeline.MODEL_STATS}")
+
+# errors worth retrying a task for; replays are harmless since results are stored idempotently
+TRANSIENT_ERRORS = (OperationalError, redis.exceptions.ConnectionError, requests.ConnectionError, requests.Timeout)
+RETRY_OPTIONS = {
+    "autoretry_for": TRANSIENT_ERRORS, 
+    "retry_backoff": True, 
+    "retry_backoff_max": 60, 
+    "retry_jitter": True, 
+    "max_retries": settings.SCAN_TASK_MAX_RETRIES, 
+}
+
+class ScanTask(celery_app.Task): 
+    def on_failure(self, exc, task_id, args, kwargs, einfo): 
+        # called once retries have run out (or for an error not worth retrying): the
+        # scan will never be stored, so don't leave its job "pending"
+        job_id = kwargs.get("job_id")
+        if job_id is None and args and isinstance(args[0], dict): 
+            # staged pipeline stages get the previous stage's dict
+            job_id = args[0].get("job_id")
+        if job_id is None: 
+            return
+        db = SessionLocal()
+        try: 
+            crud_scan.update_scan_job_status(db, job_id, "failed")
+        except Exception as e: 
+            print(f"ERROR: Could not mark job {job_id} as failed: {e}")
+        finally: 
+            db.close()
 
 TEMP_IMAGE_DIR = backend_dir / "temp_images"
 os.makedirs(TEMP_IMAGE_DIR, exist_ok=True)
 
+# staged pipeline hand-off area: decoded images wait here between the fetch and infer
+# stages (tmpfs when available, so it never touches disk)
+SPOOL_DIR = Path(settings.SCAN_SPOOL_DIR or (
+    "/dev/shm/wastevision" if os.path.isdir("/dev/shm") else TEMP_IMAGE_DIR / "spool"
+))
+
 def download_image(image_url: str) -> str | None: 
     try: 
-        response = requests.get(image_url, stream=True)
-        response.raise_for_status()
-        
         local_filename = TEMP_IMAGE_DIR / f"{uuid.uuid4()}.jpg"
-        
-        with open(local_filename, "wb") as f: 
-            for chunk in response.iter_content(chunk_size=8192): 
-                f.write(chunk)
-                
-        return str(local_filename)
+        return http_client.fetch_to_file(image_url, str(local_filename))
+    
+    except TRANSIENT_ERRORS: 
+        # the task's autoretry deals with these
+        raise
+    except Exception as e: 
+        print(f"Error downloading {image_url}: {e}")
+        return None
+
+def download_image_bytes(image_url: str) -> bytes | None: 
+    # in-memory variant of download_image: no temp file, nothing to clean up
+    try: 
+        return http_client.fetch_bytes(image_url)
     
+    except TRANSIENT_ERRORS: 
+        raise
     except Exception as e: 
         print(f"Error downloading {image_url}: {e}")
         return None
+
+def read_image_bytes(image_url: str): 
+    """
+    The image's encoded bytes: memory-mapped straight from local storage when this
+    worker can see the stored file, downloaded otherwise. None on failure, except that
+    network errors worth retrying (TRANSIENT_ERRORS) are raised.
+    """
+    local_path = storage.get_storage().local_path(image_url)
+    if local_path is None: 
+        return download_image_bytes(image_url)
+    try: 
+        return storage.map_file(local_path)
+    except (OSError, ValueError) as e: 
+        print(f"Error reading {local_path}: {e}")
+        return None
+
+def load_image(image_url: str): 
+    """
+    Fetches the image for a task. Returns (image, local_path, content_hash): in "memory"
+    mode image is a decoded array, local_path is None and content_hash is the SHA-256 of
+    the downloaded bytes (the inference cache key); in "file" mode (or if decoding fails)
+    image is a file path, and local_path is set if it is a temp file the caller must delete.
+    """
+    if settings.WORKER_IMAGE_MODE == "memory": 
+        with metrics.time_stage("download_image"): 
+            image_bytes = read_image_bytes(image_url)
+        if image_bytes is None: 
+            return None, None, None
+        image_hash = inference_cache.content_hash(image_bytes)
+        try: 
+            with metrics.time_stage("decode"): 
+                return decode_image(image_bytes), None, image_hash
+        except ValueError as e: 
+            # let ultralytics try its own loaders on the bytes we already have
+            print(f"WARNING: {e} Falling back to temp file for {image_url}.")
+            local_image_path = str(TEMP_IMAGE_DIR / f"{uuid.uuid4()}.jpg")
+            with open(local_image_path, "wb") as f: 
+                f.write(image_bytes)
+            return local_image_path, local_image_path, image_hash
+    
+    stored_path = storage.get_storage().local_path(image_url)
+    if stored_path is not None: 
+        # the stored file itself: nothing to download, and nothing to delete afterwards
+        return stored_path, None, None
+    with metrics.time_stage("download_image"): 
+        local_image_path = download_image(image_url)
+    return local_image_path, local_image_path, None
         
-# process_scan_image.delay(
-#         image_url=image_url,  # <-- FIX 3: Use a clearer parameter name
+def spool_image(image, move: bool = True) -> str: 
+    """
+    Moves a loaded image into the spool directory and returns its path: decoded arrays
+    are saved as .npy (the infer stage memory-maps them back), temp files are moved as-is
+    (copied when move is False, e.g. for files in local storage).
+    """
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    if isinstance(image, np.ndarray): 
+        spool_path = str(SPOOL_DIR / f"{uuid.uuid4()}.npy")
+        np.save(spool_path, image)
+        return spool_path
+    spool_path = str(SPOOL_DIR / f"{uuid.uuid4()}{os.path.splitext(image)[1]}")
+    try: 
+        if move: 
+            # a rename when possible; a copy + delete when the spool is on another
+            # filesystem (the default /dev/shm spool vs. temp_images on disk)
+            shutil.move(image, spool_path)
+        else: 
+            shutil.copyfile(image, spool_path)
+    except Exception: 
+        # e.g. a full tmpfs: drop the partial copy
+        if os.path.exists(spool_path): 
+            os.remove(spool_path)
+        raise
+    return spool_path
+
+def load_spooled_image(spool_path: str): 
+    if spool_path.endswith(".npy"): 
+        return np.load(spool_path, mmap_mode="r")
+    return spool_path
+
+# enqueued by name from the API via app.core.tasks.send_process_scan_image(
+#         image_url=image_url,
 #         lat=latitude,
 #         lon=longitude,
 #         job_id=job.id,
 #         user_id=current_user.id, 
-#         campus_id=current_user.campus_id 
+#         campus_id=current_user.campus_id, 
+#         pixel_scale=pixel_scale  # original / stored size, from ingest downscaling
 #     )
-@celery_app.task
-def process_scan_image(image_url: str, lat: float, lon: float, job_id: int, user_id: int, campus_id:  int): 
+@celery_app.task(name=PROCESS_SCAN_IMAGE, base=ScanTask, **RETRY_OPTIONS)
+def process_scan_image(image_url: str, lat: float, lon: float, job_id: int, user_id: int, campus_id:  int, 
+                       submitted_at: float | None = None, pixel_scale: float = 1.0): 
     
     # running the complete ml streamlined pipeline (waste detection + reconstruction)
     
     print(f"WORKER: Received task for job {job_id}. Processing image: {image_url}")
     
-    local_image_path = download_image(image_url)
-    if not local_image_path: 
-        return f"Failed to download image: {image_url}"
+    with metrics.time_stage("total"): 
+        try: 
+            result = _process_scan_image(image_url, lat, lon, job_id, campus_id, pixel_scale)
+        except Exception: 
+            metrics.SCAN_FAILURES.labels(reason="exception").inc()
+            raise
+    
+    _record_latency(submitted_at)
+    print(f"WORKER: Finished processing for image: {image_url}")
+    return result
+
+def _process_scan_image(image_url: str, lat: float, lon: float, job_id: int, campus_id: int, pixel_scale: float = 1.0): 
+    image, local_image_path, image_hash = load_image(image_url)
+    if image is None: 
+        metrics.SCAN_FAILURES.labels(reason="download").inc()
+        # not retried (e.g. a 404): ScanTask.on_failure marks the job failed
+        raise RuntimeError(f"Failed to download image: {image_url}")
+    
+    try: 
+        waste_volume, model_version = _run_inference(image, image_hash, pixel_scale)
+    finally: 
+        if local_image_path and os.path.exists(local_image_path): 
+            os.remove(local_image_path)
+    
+    return _persist_scan_result(image_url, lat, lon, job_id, campus_id, waste_volume, model_version)
+
+# enqueued by name from the API via app.core.tasks.send_process_scan_batch(...) for
+# POST /api/scans/batch: up to BATCH_TASK_SIZE images of one job per message
+@celery_app.task(name=PROCESS_SCAN_BATCH, base=ScanTask, **RETRY_OPTIONS)
+def process_scan_batch(scans: list, job_id: int, user_id: int, campus_id: int, submitted_at: float | None = None): 
+    print(f"WORKER: Received batch of {len(scans)} images for job {job_id}.")
+    
+    with metrics.time_stage("total_batch"): 
+        try: 
+            result = _process_scan_batch(scans, job_id, campus_id)
+        except Exception: 
+            metrics.SCAN_FAILURES.labels(reason="exception").inc(len(scans))
+            raise
+    
+    _record_latency(submitted_at)
+    print(f"WORKER: Finished batch for job {job_id}: {result}")
+    return result
+
+def _read_many_image_bytes(urls: list) -> list: 
+    # read_image_bytes for many urls, with the remote downloads overlapping on the pooled
+    # HTTP client; one entry per url: the bytes, or the exception that prevented reading them
+    results = [None] * len(urls)
+    remote = []
+    for i, url in enumerate(urls): 
+        local_path = storage.get_storage().local_path(url)
+        if local_path is None: 
+            remote.append(i)
+            continue
+        try: 
+            results[i] = storage.map_file(local_path)
+        except (OSError, ValueError) as e: 
+            results[i] = e
+    
+    if remote: 
+        downloads = asyncio.run(http_client.fetch_many(
+            [urls[i] for i in remote], concurrency=settings.HTTP_POOL_SIZE
+        ))
+        for i, image_bytes in zip(remote, downloads): 
+            results[i] = image_bytes
+    return results
+
+def _process_scan_batch(scans: list, job_id: int, campus_id: int): 
+    with metrics.time_stage("download_image"): 
+        downloads = _read_many_image_bytes([scan["image_url"] for scan in scans])
+    
+    ready, images, image_hashes, pixel_scales = [], [], [], []
+    for scan, image_bytes in zip(scans, downloads): 
+        if isinstance(image_bytes, Exception): 
+            print(f"Error downloading {scan['image_url']}: {image_bytes}")
+            metrics.SCAN_FAILURES.labels(reason="download").inc()
+            continue
+        try: 
+            with metrics.time_stage("decode"): 
+                images.append(decode_image(image_bytes))
+        except ValueError as e: 
+            print(f"WARNING: {e} Skipping {scan['image_url']}.")
+            metrics.SCAN_FAILURES.labels(reason="decode").inc()
+            continue
+        image_hashes.append(inference_cache.content_hash(image_bytes))
+        pixel_scales.append(scan.get("pixel_scale", 1.0))
+        ready.append(scan)
+    if not ready: 
+        return {"status": "failed", "processed": 0, "failed": len(scans)}
     
-    # complete ml pipeline 
-    waste_volume = process_waste_image(local_image_path)
+    with metrics.time_stage("run_detection_batch"): 
+        outputs = process_waste_images(images, content_hashes=image_hashes, pixel_scales=pixel_scales)
+    metrics.export_prefilter_stats(pipeline.prefilter_stats())
+    del images
     
     db = SessionLocal()
     try: 
-        zone = crud_zone.find_zone_by_coords(db, lat=lat, lon=lon, campus_id=campus_id)
+        rows = []
+        failed = len(scans) - len(ready)
+        for scan, output in zip(ready, outputs): 
+            if output["error"]: 
+                # nothing is stored: a failed inference must not count as a clean photo
+                print(f"ERROR: Detection failed for {scan['image_url']}: {output['error']}")
+                metrics.SCAN_FAILURES.labels(reason="inference").inc()
+                failed += 1
+                continue
+            if not output["volume_cm3"]: 
+                metrics.SCAN_EMPTY_DETECTIONS.inc()
+            with metrics.time_stage("find_zone_by_coords"): 
+                zone = crud_zone.find_zone_by_coords(db, lat=scan["lat"], lon=scan["lon"], campus_id=campus_id)
+            if not zone: 
+                print(f"WARNING: No Zone found for coords ({scan['lat']}, {scan['lon']}) on campus {campus_id}.")
+                metrics.SCAN_UNMATCHED_ZONES.inc()
+                continue
+            rows.append({
+                "job_id": job_id, 
+                "zone_id": zone.id, 
+                "image_url": scan["image_url"], 
+                "waste_volume_estimate": output["volume_cm3"], 
+                "model_version": output["model_version"], 
+            })
+    finally: 
+        db.close()
+    
+    # one insert for the whole batch and one UPDATE per zone
+    if settings.SCAN_PERSIST_MODE == "buffered": 
+        for row in rows: 
+            RESULT_BUFFER.add(row)
+    elif rows: 
+        _write_scan_results(rows)
+    return {"status": "success", "processed": len(rows), "failed": failed}
+
+# --- staged pipeline (SCAN_PIPELINE_MODE="staged") ---
+# fetch (scans.io) -> infer (scans.cpu) -> persist (scans.db), chained by
+# app.core.tasks.send_process_scan_image. Run one worker per queue, e.g.:
+#   WORKER_ROLE=io  celery -A celery_worker.celery_app worker -Q scans.io  -P threads -c 32
+#   WORKER_ROLE=cpu celery -A celery_worker.celery_app worker -Q scans.cpu -c <cores>
+#   WORKER_ROLE=db  celery -A celery_worker.celery_app worker -Q scans.db  -P threads -c 4
+# Batch submissions (process_scan_batch) are not split into stages: they go to scans.cpu,
+# so the CPU workers also need database access. Zone flushes go to scans.db.
+# The I/O and CPU workers must share SPOOL_DIR (same host, or a shared mount). To scrape
+# them, give each its own WORKER_METRICS_PORT (e.g. 9101, 9102, 9103).
+
+@celery_app.task(name=FETCH_SCAN_IMAGE, base=ScanTask, **RETRY_OPTIONS)
+def fetch_scan_image(image_url: str, lat: float, lon: float, job_id: int, user_id: int, campus_id: int, 
+                     submitted_at: float | None = None, pixel_scale: float = 1.0): 
+    print(f"WORKER: Fetching image for job {job_id}: {image_url}")
+    image, local_image_path, image_hash = load_image(image_url)
+    if image is None: 
+        metrics.SCAN_FAILURES.labels(reason="download").inc()
+        # raising stops the chain; there is nothing to infer or persist
+        raise RuntimeError(f"Failed to download image: {image_url}")
+    
+    try: 
+        image_ref = spool_image(image, move=local_image_path is not None)
+    except Exception: 
+        # don't leave the downloaded temp file behind
+        if local_image_path and os.path.exists(local_image_path): 
+            os.remove(local_image_path)
+        raise
+    
+    return {
+        "image_ref": image_ref, 
+        "content_hash": image_hash, 
+        "pixel_scale": pixel_scale, 
+        "image_url": image_url, 
+        "lat": lat, 
+        "lon": lon, 
+        "job_id": job_id, 
+        "campus_id": campus_id, 
+        "submitted_at": submitted_at, 
+    }
+
+@celery_app.task(name=INFER_SCAN_IMAGE, base=ScanTask)
+def infer_scan_image(scan: dict): 
+    scan = dict(scan)
+    image_ref = scan.pop("image_ref")
+    try: 
+        image = load_spooled_image(image_ref)
+        scan["waste_volume"], scan["model_version"] = _run_inference(
+            image, scan.pop("content_hash"), scan.pop("pixel_scale", 1.0)
+        )
+        del image
+    except Exception: 
+        metrics.SCAN_FAILURES.labels(reason="exception").inc()
+        raise
+    finally: 
+        if os.path.exists(image_ref): 
+            os.remove(image_ref)
+    return scan
+
+@celery_app.task(name=PERSIST_SCAN_RESULT, base=ScanTask, **RETRY_OPTIONS)
+def persist_scan_result(scan: dict): 
+    scan = dict(scan)
+    submitted_at = scan.pop("submitted_at", None)
+    try: 
+        result = _persist_scan_result(**scan)
+    except Exception: 
+        metrics.SCAN_FAILURES.labels(reason="exception").inc()
+        raise
+    _record_latency(submitted_at)
+    print(f"WORKER: Finished processing for image: {scan['image_url']}")
+    return result
+
+def _record_latency(submitted_at: float | None): 
+    # submission -> stored result; read back by the API's admission control
+    if submitted_at: 
+        admission.record_scan_latency(time.time() - submitted_at)
+
+def _run_inference(image, image_hash: str | None, pixel_scale: float = 1.0): 
+    """
+    Runs the ml pipeline (detection + reconstruction) on a loaded image and returns
+    (waste_volume, model_version), the volume measured at the photo's original resolution. Detection errors propagate, failing the task rather
+    than storing a zero volume.
+    """
+    timings = {}
+    try: 
+        waste_volume = process_waste_image(image, content_hash=image_hash, timings=timings, pixel_scale=pixel_scale)
+    finally: 
+        metrics.export_prefilter_stats(pipeline.prefilter_stats())
+    # the version that actually ran, even if a newer one was swapped in since
+    model_version = timings["model_version"]
+    
+    if not timings["cache_hit"]: 
+        metrics.observe_stage("run_detection", timings["detection"])
+        metrics.observe_stage("estimate_volume_from_detections", timings["reconstruction"])
+    if not waste_volume: 
+        metrics.SCAN_EMPTY_DETECTIONS.inc()
+    return waste_volume, model_version
+
+def _write_scan_results(rows: list): 
+    db = SessionLocal()
+    try: 
+        with metrics.time_stage("flush_scan_results"): 
+            # replays of already stored results are skipped, and don't count towards the zones
+            stored = crud_scan.create_scan_results_bulk(db, rows, commit=False)
+            zone_volumes = {}
+            for row in stored: 
+                volume, scans = zone_volumes.get(row["zone_id"], (0.0, 0))
+                zone_volumes[row["zone_id"]] = (volume + (row["waste_volume_estimate"] or 0.0), scans + 1)
+            for zone_id, (volume, scans) in zone_volumes.items(): 
+                crud_logic.add_zone_waste(db, zone_id, volume, scans=scans, commit=False)
+            db.commit()
+    except Exception: 
+        db.rollback()
+        raise
+    finally: 
+        db.close()
+    metrics.SCANS_PROCESSED.inc(len(stored))
+    metrics.SCAN_DUPLICATES.inc(len(rows) - len(stored))
+    print(f"-> Saved {len(stored)} results to DB in one batch ({len(rows) - len(stored)} already stored).")
+
+RESULT_BUFFER = ResultBuffer(
+    _write_scan_results, 
+    max_rows=settings.SCAN_BUFFER_MAX_ROWS, 
+    max_seconds=settings.SCAN_BUFFER_MAX_SECONDS
+)
+
+def _flush_result_buffer(): 
+    try: 
+        RESULT_BUFFER.flush()
+    except Exception as e: 
+        print(f"ERROR: Could not flush {RESULT_BUFFER.pending()} buffered scan results: {e}")
+
+atexit.register(_flush_result_buffer)
+
+def _persist_scan_result(image_url: str, lat: float, lon: float, job_id: int, campus_id: int, 
+                         waste_volume: float, model_version: str | None): 
+    db = SessionLocal()
+    try: 
+        with metrics.time_stage("find_zone_by_coords"): 
+            zone = crud_zone.find_zone_by_coords(db, lat=lat, lon=lon, campus_id=campus_id)
         
         if not zone: 
             print(f"WARNING: No Zone found for coords ({lat}, {lon}) on campus {campus_id}.")
+            metrics.SCAN_UNMATCHED_ZONES.inc()
             return f"No zone found for coords."
+        
+        if settings.SCAN_PERSIST_MODE == "buffered": 
+            # written (with the zone status) by the next RESULT_BUFFER flush
+            RESULT_BUFFER.add({
+                "job_id": job_id, 
+                "zone_id": zone.id, 
+                "image_url": image_url, 
+                "waste_volume_estimate": waste_volume, 
+                "model_version": model_version, 
+            })
+            return {"status": "buffered", "image_url": image_url}
     
-        crud_scan.create_scan_result(
-            db=db, 
-            job_id=job_id, 
-            zone_id=zone.id, 
-            image_url=image_url, 
-            waste_volume_estimate=waste_volume
-        )
+        with metrics.time_stage("create_scan_result"): 
+            scan_result_id = crud_scan.create_scan_result(
+                db=db, 
+                job_id=job_id, 
+                zone_id=zone.id, 
+                image_url=image_url, 
+                waste_volume_estimate=waste_volume, 
+                model_version=model_version, 
+                commit=False
+            )
+        
+        if scan_result_id is None: 
+            # a retried / redelivered task: the result is already stored
+            db.rollback()
+            print(f"-> Result for {image_url} in job {job_id} is already stored; skipping.")
+            metrics.SCAN_DUPLICATES.inc()
+            if settings.ZONE_UPDATE_MODE == "coalesced": 
+                # the earlier attempt may have committed the row and then failed to reach
+                # Redis: record the stored result's delta again (a no-op if it got there)
+                stored = crud_scan.get_scan_result(db, job_id=job_id, image_url=image_url)
+                _mark_result_dirty(stored.id, stored.zone_id, stored.waste_volume_estimate)
+            return {"status": "duplicate", "image_url": image_url}
+
+        with metrics.time_stage("update_zone_status"): 
+            if settings.ZONE_UPDATE_MODE == "coalesced": 
+                db.commit()
+                # if Redis fails here the task is retried, and the replay above records the delta
+                _mark_result_dirty(scan_result_id, zone.id, waste_volume)
+            else: 
+                # commits the result and the zone total together
+                crud_logic.add_zone_waste(db, zone_id=zone.id, waste_volume=waste_volume)
     
         print(f"-> Saved result to DB for zone {zone.zone_code}.")
+    finally: 
+        db.close()
+    
+    metrics.SCANS_PROCESSED.inc()
+    return {"status": "success", "image_url": image_url}
+
+def _mark_zone_dirty(zone_id: int, waste_volume: float, scans: int = 1): 
+    if zone_updates.mark_zone_dirty(zone_id, waste_volume, scans): 
+        celery_app.send_task(FLUSH_ZONE_UPDATES, countdown=settings.ZONE_UPDATE_INTERVAL_SECONDS)
 
-        crud_logic.update_zone_status(db, zone_id=zone.id)
+def _mark_result_dirty(result_id: int, zone_id: int, waste_volume: float): 
+    if zone_updates.mark_result_dirty(result_id, zone_id, waste_volume): 
+        celery_app.send_task(FLUSH_ZONE_UPDATES, countdown=settings.ZONE_UPDATE_INTERVAL_SECONDS)
+
+@celery_app.task(name=FLUSH_ZONE_UPDATES)
+def flush_zone_updates(): 
+    # applies the deltas coalesced since the last flush, one UPDATE per dirty zone
+    pending = zone_updates.pop_dirty_zones()
+    if not pending: 
+        return 0
+    
+    db = SessionLocal()
+    try: 
+        with metrics.time_stage("flush_zone_updates"): 
+            for zone_id, (volume, scans) in pending.items(): 
+                crud_logic.add_zone_waste(db, zone_id, volume, scans=scans, commit=False)
+            db.commit()
+    except Exception: 
+        db.rollback()
+        # hand the deltas back so the next flush applies them
+        for zone_id, (volume, scans) in pending.items(): 
+            _mark_zone_dirty(zone_id, volume, scans)
+        raise
     finally: 
-        if os.path.exists(local_image_path): 
-            os.remove(local_image_path)
         db.close()
-        
-        
-    import time
-    time.sleep(10)
-    print(f"WORKER: Finished processing for image: {image_url}")
-    return {"status": "success", "image_url": image_url}
\ No newline at end of file
+    return len(pending)
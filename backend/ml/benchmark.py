@@ -0,0 +1,208 @@
+# backend/ml/benchmark.py
+"""
+Standalone benchmark for the ML pipeline.
+
+Generates synthetic images of several sizes and times each stage (decode,
+detection, reconstruction) plus the end-to-end process_waste_image call,
+reporting p50/p95/p99 latency and images/sec as JSON.
+
+Runs offline on a CPU-only box: when the trained weights are missing it falls
+back to an untrained stand-in built from an ultralytics model config, which
+exercises the same code paths (latency is what matters here, not accuracy).
+
+Usage (from backend/):
+    python -m ml.benchmark
+    python -m ml.benchmark --sizes 640x480 4000x3000 --iterations 50 --output ml/data/bench.json
+    python -m ml.benchmark --baseline ml/data/bench_main.json --max-regression 0.10
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import contextlib
+from datetime import datetime, timezone
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+from . import detection
+from . import reconstruction
+from . import pipeline
+from .config import ml_settings
+
+DEFAULT_SIZES = ["640x480", "1280x960", "1920x1080", "4000x3000"]
+# Untrained, tiny model used when the trained weights aren't available
+STAND_IN_MODEL_CONFIG = "yolov8n.yaml"
+# Boxes per synthetic scene for the reconstruction stage (dense scene)
+RECONSTRUCTION_BOXES = 300
+
+
+def make_synthetic_image(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """
+    Noisy background with a few filled shapes, so JPEG encode/decode cost is realistic.
+    """
+    rng = np.random.default_rng(seed)
+    image = rng.integers(0, 255, size=(height, width, 3), dtype=np.uint8)
+    for _ in range(12):
+        x1, y1 = int(rng.integers(0, width - 1)), int(rng.integers(0, height - 1))
+        x2 = min(width - 1, x1 + int(rng.integers(20, max(21, width // 4))))
+        y2 = min(height - 1, y1 + int(rng.integers(20, max(21, height // 4))))
+        color = tuple(int(c) for c in rng.integers(0, 255, size=3))
+        cv2.rectangle(image, (x1, y1), (x2, y2), color, thickness=-1)
+    return image
+
+
+def make_synthetic_detections(width: int, height: int, count: int = RECONSTRUCTION_BOXES, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    x1 = rng.uniform(0, width * 0.9, count)
+    y1 = rng.uniform(0, height * 0.9, count)
+    x2 = np.minimum(width, x1 + rng.uniform(10, width * 0.2, count))
+    y2 = np.minimum(height, y1 + rng.uniform(10, height * 0.2, count))
+    labels = rng.choice(["plastic", "paper", "metal"], count)
+    return [
+        {"box": [float(a), float(b), float(c), float(d)], "label": str(label), "confidence": 0.9}
+        for a, b, c, d, label in zip(x1, y1, x2, y2, labels)
+    ]
+
+
+def summarise(samples_s: list) -> dict:
+    samples_ms = np.asarray(samples_s) * 1000
+    return {
+        "n": int(len(samples_ms)),
+        "mean_ms": float(samples_ms.mean()),
+        "p50_ms": float(np.percentile(samples_ms, 50)),
+        "p95_ms": float(np.percentile(samples_ms, 95)),
+        "p99_ms": float(np.percentile(samples_ms, 99)),
+        "images_per_sec": float(1000 / samples_ms.mean()) if samples_ms.mean() > 0 else None,
+    }
+
+
+def time_stage(fn, iterations: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return summarise(samples)
+
+
+def load_benchmark_model() -> tuple:
+    """
+    Returns (model, description). Uses the configured engine when the trained
+    weights exist, otherwise the untrained stand-in.
+    """
+    if os.path.exists(ml_settings.MODEL_PATH):
+        return pipeline.load_model(), f"{ml_settings.MODEL_PATH} ({ml_settings.ENGINE})"
+    print(f"⚠️ {ml_settings.MODEL_PATH} not found, using untrained stand-in '{STAND_IN_MODEL_CONFIG}'.")
+    model = YOLO(STAND_IN_MODEL_CONFIG)
+    pipeline.set_model(model, version="stand-in", warm_up=False)
+    return model, f"stand-in {STAND_IN_MODEL_CONFIG} (torch)"
+
+
+def run_benchmark(sizes: list, iterations: int, warmup: int) -> dict:
+    model, model_description = load_benchmark_model()
+    pipeline.warm_up_model()
+
+    # The cache would turn every repeat into a hit; measure the uncached path
+    saved_cache, pipeline.INFERENCE_CACHE = pipeline.INFERENCE_CACHE, None
+
+    results = {}
+    try:
+        for size in sizes:
+            width, height = (int(v) for v in size.lower().split("x"))
+            print(f"📏 Benchmarking {width}x{height} ({iterations} iterations)...")
+            image = make_synthetic_image(width, height)
+            encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+            detections = make_synthetic_detections(width, height)
+
+            # silence the pipeline's per-image prints while timing
+            with contextlib.redirect_stdout(io.StringIO()):
+                results[size] = {
+                    "encoded_bytes": len(encoded),
+                    "decode": time_stage(lambda: detection.decode_image(encoded), iterations, warmup),
+                    "detection": time_stage(lambda: detection.run_detection(model, image), iterations, warmup),
+                    "reconstruction": time_stage(
+                        lambda: reconstruction.estimate_volume_breakdown(detections), iterations, warmup
+                    ),
+                    "end_to_end": time_stage(lambda: pipeline.process_waste_image(encoded), iterations, warmup),
+                }
+            e2e = results[size]["end_to_end"]
+            print(f"   end-to-end p50 {e2e['p50_ms']:.1f} ms, p95 {e2e['p95_ms']:.1f} ms, "
+                  f"{e2e['images_per_sec']:.2f} images/sec")
+    finally:
+        pipeline.INFERENCE_CACHE = saved_cache
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "model": model_description,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "iterations": iterations,
+            "warmup": warmup,
+            "tiled_inference": ml_settings.TILED_INFERENCE,
+        },
+        "results": results,
+    }
+
+
+def compare_to_baseline(report: dict, baseline: dict, max_regression: float) -> list:
+    """
+    Returns a list of human-readable regressions where p50 grew by more than max_regression (fraction).
+    """
+    regressions = []
+    for size, stages in report["results"].items():
+        for stage, stats in stages.items():
+            if not isinstance(stats, dict):
+                continue
+            base = baseline.get("results", {}).get(size, {}).get(stage)
+            if not base or not base.get("p50_ms"):
+                continue
+            change = stats["p50_ms"] / base["p50_ms"] - 1
+            if change > max_regression:
+                regressions.append(
+                    f"{size} {stage}: p50 {base['p50_ms']:.2f} -> {stats['p50_ms']:.2f} ms (+{change:.0%})"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the WasteVision ML pipeline.")
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, help="Image sizes as WIDTHxHEIGHT.")
+    parser.add_argument("--iterations", type=int, default=20, help="Timed iterations per stage.")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed iterations per stage.")
+    parser.add_argument("--output", type=str, default="ml/data/benchmark.json", help="Where to write the JSON report.")
+    parser.add_argument("--baseline", type=str, default=None, help="Earlier JSON report to compare against.")
+    parser.add_argument("--max-regression", type=float, default=0.10,
+                        help="Allowed p50 slowdown vs. baseline before failing (fraction).")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.sizes, args.iterations, args.warmup)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"📊 Benchmark report saved to: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(report, baseline, args.max_regression)
+        if regressions:
+            print("❌ Regressions against baseline:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print("✅ No regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
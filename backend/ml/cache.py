@@ -0,0 +1,147 @@
+# backend/ml/cache.py
+import mmap
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# Inference cache: maps image content -> {"detections": [...], "volume_cm3": float}
+# so re-submitted / replayed photos skip the model entirely.
+#
+# Lookups go: exact SHA-256 (process memory, then Redis if configured), then, if
+# enabled, the nearest perceptual hash within a Hamming-distance threshold
+# (process memory only; near-duplicate search needs a scan Redis can't do cheaply).
+
+REDIS_KEY_PREFIX = "wastevision:inference:"
+
+
+def content_hash(image) -> str:
+    """
+    SHA-256 of encoded bytes (or a memory-mapped file), of a file's contents, or of a
+    decoded array's buffer.
+    """
+    if isinstance(image, (bytes, bytearray, memoryview, mmap.mmap)):
+        return hashlib.sha256(image).hexdigest()
+    if isinstance(image, np.ndarray):
+        return hashlib.sha256(np.ascontiguousarray(image).data).hexdigest()
+    digest = hashlib.sha256()
+    with open(image, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def perceptual_hash(image: np.ndarray) -> int:
+    """
+    64-bit difference hash (dHash) of a decoded BGR image: robust to re-encoding,
+    resizing and small exposure changes.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class InferenceCache:
+    """
+    Thread-safe LRU + TTL cache of inference results, optionally mirrored to Redis.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: int = 3600,
+                 phash_max_distance: int | None = None, redis_url: str | None = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.phash_max_distance = phash_max_distance
+        self.redis_url = redis_url
+        self._entries = OrderedDict()  # sha256 -> (expires_at, phash, value)
+        self._lock = threading.Lock()
+        self._redis = None
+        self.stats = {"hits": 0, "phash_hits": 0, "redis_hits": 0, "misses": 0}
+
+    def _get_redis(self):
+        if self.redis_url and self._redis is None:
+            import redis
+            self._redis = redis.Redis.from_url(self.redis_url)
+        return self._redis
+
+    def _store_local(self, key: str, phash: int | None, value: dict):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, phash, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _get_local(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def _get_near_duplicate(self, phash: int):
+        now = time.monotonic()
+        best_key, best_distance = None, self.phash_max_distance + 1
+        with self._lock:
+            for key, (expires_at, stored_phash, _) in self._entries.items():
+                if stored_phash is None or expires_at < now:
+                    continue
+                distance = hamming_distance(phash, stored_phash)
+                if distance < best_distance:
+                    best_key, best_distance = key, distance
+            if best_key is None:
+                return None
+            self._entries.move_to_end(best_key)
+            return self._entries[best_key][2]
+
+    def get(self, key: str, phash: int | None = None) -> dict | None:
+        value = self._get_local(key)
+        if value is not None:
+            self.stats["hits"] += 1
+            return value
+
+        redis_client = self._get_redis()
+        if redis_client is not None:
+            try:
+                raw = redis_client.get(REDIS_KEY_PREFIX + key)
+            except Exception as e:
+                print(f"⚠️ Inference cache Redis lookup failed: {e}")
+                raw = None
+            if raw is not None:
+                value = json.loads(raw)
+                self._store_local(key, phash, value)
+                self.stats["redis_hits"] += 1
+                return value
+
+        if phash is not None and self.phash_max_distance is not None:
+            value = self._get_near_duplicate(phash)
+            if value is not None:
+                self.stats["phash_hits"] += 1
+                return value
+
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, key: str, value: dict, phash: int | None = None):
+        self._store_local(key, phash, value)
+        redis_client = self._get_redis()
+        if redis_client is not None:
+            try:
+                redis_client.set(REDIS_KEY_PREFIX + key, json.dumps(value), ex=self.ttl_seconds)
+            except Exception as e:
+                print(f"⚠️ Inference cache Redis write failed: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,60 @@
+# backend/ml/config.py
+from pydantic import Field
+from pydantic_settings import BaseSettings
+
+class MLSettings(BaseSettings):
+    # Path to the trained PyTorch weights; exported engines are written next to it
+    MODEL_PATH: str = "ml/models/best.pt"
+
+    # Local model registry (see ml/registry.py); its active version overrides MODEL_PATH
+    REGISTRY_DIR: str = "ml/models/registry"
+    REGISTRY_POLL_SECONDS: float = 10.0
+
+    # Inference engine: "torch", "onnx" (ONNX Runtime), "openvino" or "onnx-int8"
+    ENGINE: str = "torch"
+
+    # Input size used when exporting to ONNX / OpenVINO
+    EXPORT_IMGSZ: int = 640
+
+    # INT8 variant (ENGINE=onnx-int8): "dynamic", or "static" calibrated on QUANT_CALIBRATION_DIR
+    QUANT_MODE: str = "dynamic"
+    QUANT_CALIBRATION_DIR: str | None = None
+
+    # Dummy inferences run after loading, and the input size they use
+    WARMUP_RUNS: int = 1
+    WARMUP_IMGSZ: int = 640
+
+    # Load weights once in the Celery parent so prefork children share them copy-on-write
+    PRELOAD_IN_PARENT: bool = False
+
+    # Tiled inference for high-resolution photos (opt-in): images whose longest edge
+    # is at least TILE_MIN_EDGE are cut into overlapping TILE_SIZE tiles. API scans are
+    # downscaled to INGEST_MAX_EDGE (1280) at ingest, so while this is on the API keeps
+    # TILE_MIN_EDGE px instead; set ML_TILED_INFERENCE / ML_TILE_MIN_EDGE for both
+    TILED_INFERENCE: bool = False
+    TILE_SIZE: int = 640
+    TILE_OVERLAP: float = 0.2
+    TILE_MIN_EDGE: int = 1600
+
+    # Clean-image pre-filter: a PREFILTER_IMGSZ pass of the same model; images whose best
+    # box confidence is below PREFILTER_THRESHOLD skip full detection (volume 0)
+    PREFILTER_ENABLED: bool = False
+    PREFILTER_IMGSZ: int = 320
+    PREFILTER_THRESHOLD: float = 0.15
+
+    # Inference cache (see ml/cache.py)
+    CACHE_ENABLED: bool = True
+    CACHE_MAX_ENTRIES: int = 1024
+    CACHE_TTL_SECONDS: int = 3600
+    # Match near-duplicates by perceptual hash within this many differing bits (None = exact only)
+    CACHE_PHASH_MAX_DISTANCE: int | None = None
+    # Mirror exact-hash entries to Redis so all workers share them
+    CACHE_USE_REDIS: bool = False
+    REDIS_URL: str | None = Field(default=None, validation_alias="REDIS_URL")
+
+    class Config:
+        env_file = ".env"
+        env_prefix = "ML_"
+        extra = "ignore"
+
+ml_settings = MLSettings()
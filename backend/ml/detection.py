@@ -1,36 +1,336 @@
 # backend/ml/detection.py
+import time
+import cv2
+import numpy as np
 from ultralytics import YOLO
 
 # Define the output directory for saved images
 OUTPUT_DIR = "ml/detected_images"
 
-def run_detection(model: YOLO, image_path: str, save_output: bool = False) -> list:
+# Confidence threshold shared by the single and batched entry points
+CONF_THRESHOLD = 0.4
+
+# Number of frames sent through the model per forward pass in batch mode.
+# On CPU-only workers 8-16 gives the best images/sec.
+DEFAULT_BATCH_SIZE = 8
+
+# Tiled (sliced) inference defaults for high-resolution photos
+DEFAULT_TILE_SIZE = 640
+DEFAULT_TILE_OVERLAP = 0.2
+# IoU above which two same-class boxes from neighbouring tiles are treated as one object
+TILE_NMS_IOU = 0.5
+
+# (xyxy, class ids, confidences) for an image with no detections
+EMPTY_BOXES = (np.empty((0, 4), dtype=np.float32), np.empty(0, dtype=int), np.empty(0, dtype=np.float32))
+
+
+def decode_image(image_bytes: bytes) -> np.ndarray:
+    """
+    Decodes raw encoded image bytes (JPEG, PNG, ...) into a BGR NumPy array,
+    the layout ultralytics expects for in-memory sources.
+    """
+    image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Could not decode image bytes.")
+    return image
+
+
+def read_image(image_path: str) -> np.ndarray:
+    """
+    Reads an image file into a BGR NumPy array.
+    """
+    image = cv2.imread(image_path, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"Could not read image file '{image_path}'.")
+    return image
+
+
+def _prepare_source(image):
+    """
+    Normalises one input (path, bytes or array) into something model.predict accepts.
+    """
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return decode_image(bytes(image))
+    return image
+
+
+def _result_boxes(result) -> tuple:
+    """
+    Returns one ultralytics Results object's boxes as NumPy arrays:
+    (xyxy (N, 4), class ids (N,), confidences (N,)).
+    """
+    if result is None or result.boxes is None or len(result.boxes) == 0:
+        return EMPTY_BOXES
+
+    # One device->host copy per tensor instead of one per box
+    boxes = result.boxes
+    return (
+        boxes.xyxy.cpu().numpy(),
+        boxes.cls.cpu().numpy().astype(int),
+        boxes.conf.cpu().numpy(),
+    )
+
+
+def to_detections(boxes: tuple, names: dict) -> list:
+    """
+    Converts (xyxy, class ids, confidences) arrays into our detection dict format
+    (what the API, the inference cache and the audit CLI work with).
+    """
+    xyxy, class_ids, confidences = boxes
+    return [
+        {"box": box, "label": names[class_id], "confidence": confidence}
+        for box, class_id, confidence in zip(xyxy.tolist(), class_ids.tolist(), confidences.tolist())
+    ]
+
+
+def _to_detections(result, names: dict) -> list:
+    """
+    Converts one ultralytics Results object into our detection dict format.
+    """
+    return to_detections(_result_boxes(result), names)
+
+
+def detect_boxes(model: YOLO, image, save_output: bool = False) -> tuple:
+    """
+    Runs detection on a single image and returns its boxes as arrays,
+    (xyxy, class ids, confidences), ready for reconstruction.estimate_volume_from_boxes.
+    """
+    results = model.predict(
+        source=_prepare_source(image),
+        conf=CONF_THRESHOLD,
+        verbose=False,
+        save=save_output,
+        project=OUTPUT_DIR,
+        name="runs",
+        exist_ok=True
+    )
+    return _result_boxes(results[0] if results else None)
+
+
+def run_detection(model: YOLO, image, save_output: bool = False) -> list:
     """
     Runs detection on a single image and returns structured results.
+    `image` may be a path, encoded bytes or a decoded array (passed to the model as-is).
     saves the annotated image.
     """
     try:
-        # Pass save=True to the predict method if requested
-        results = model.predict(
-            source=image_path,
-            conf=0.4,
-            verbose=False,
-            save=save_output, # <-- Controls whether to save the image
-            project=OUTPUT_DIR,
-            name="runs",
-            exist_ok=True
-        )
-        
-        detections = []
-        if results and results[0].boxes is not None:
-            for box in results[0].boxes:
-                class_id = int(box.cls[0])
-                detections.append({
-                    "box": box.xyxy[0].tolist(),
-                    "label": model.names[class_id],
-                    "confidence": float(box.conf[0])
-                })
-        return detections
+        return to_detections(detect_boxes(model, image, save_output=save_output), model.names)
     except Exception as e:
         print(f"❌ Error during YOLO detection: {e}")
-        return []
\ No newline at end of file
+        return []
+
+
+def score_waste_presence(model: YOLO, images: list, imgsz: int = 320, conf: float = 0.05,
+                         batch_size: int = DEFAULT_BATCH_SIZE) -> list:
+    """
+    Cheap "is there waste at all" pass: runs the model at a reduced input size with a
+    low confidence floor and returns the highest box confidence per image (0.0 when
+    nothing is found). Much cheaper than full detection since cost scales with imgsz².
+    """
+    scores = []
+    for start in range(0, len(images), max(1, int(batch_size))):
+        chunk = [_prepare_source(image) for image in images[start:start + batch_size]]
+        results = list(model.predict(source=chunk, conf=conf, imgsz=imgsz, batch=len(chunk), verbose=False) or [])
+        for i in range(len(chunk)):
+            result = results[i] if i < len(results) else None
+            if result is None or result.boxes is None or len(result.boxes) == 0:
+                scores.append(0.0)
+            else:
+                scores.append(float(result.boxes.conf.max()))
+    return scores
+
+
+def detect_boxes_batch(model: YOLO, images: list, batch_size: int = DEFAULT_BATCH_SIZE, save_output: bool = False) -> list:
+    """
+    Runs detection on many images, batch_size frames per forward pass.
+
+    Args:
+        images: Image paths, encoded image bytes or BGR NumPy arrays (may be mixed).
+        batch_size: Number of images sent to model.predict at once.
+
+    Returns:
+        One (xyxy, class ids, confidences) tuple per input, in input order. When a
+        batch fails (e.g. one corrupt image in it) its images are retried one at a
+        time, and an image that still fails yields its exception in place of boxes,
+        so callers can still zip results and tell a failure from an empty image.
+    """
+    batch_size = max(1, int(batch_size))
+    all_boxes = []
+
+    for start in range(0, len(images), batch_size):
+        chunk = images[start:start + batch_size]
+        try:
+            sources = [_prepare_source(image) for image in chunk]
+            results = model.predict(
+                source=sources,
+                conf=CONF_THRESHOLD,
+                batch=len(sources),
+                verbose=False,
+                save=save_output,
+                project=OUTPUT_DIR,
+                name="runs",
+                exist_ok=True
+            )
+            results = list(results or [])
+            for i in range(len(chunk)):
+                all_boxes.append(_result_boxes(results[i] if i < len(results) else None))
+        except Exception as e:
+            print(f"❌ Error during batched YOLO detection (images {start}-{start + len(chunk) - 1}): {e}; "
+                  f"retrying them one at a time")
+            for i, image in enumerate(chunk):
+                try:
+                    all_boxes.append(detect_boxes(model, image, save_output=save_output))
+                except Exception as image_error:
+                    print(f"❌ Error during YOLO detection (image {start + i}): {image_error}")
+                    all_boxes.append(image_error)
+
+    return all_boxes
+
+
+def run_detection_batch(model: YOLO, images: list, batch_size: int = DEFAULT_BATCH_SIZE, save_output: bool = False) -> list:
+    """
+    Same as detect_boxes_batch, returning one detection dict list per input (empty
+    for images whose batch failed).
+    """
+    return [
+        [] if isinstance(boxes, Exception) else to_detections(boxes, model.names)
+        for boxes in detect_boxes_batch(model, images, batch_size=batch_size, save_output=save_output)
+    ]
+
+
+def _tile_origins(length: int, tile_size: int, stride: int) -> list:
+    """
+    Start offsets along one axis so tiles cover [0, length) and the last one ends flush with the edge.
+    """
+    if length <= tile_size:
+        return [0]
+    origins = list(range(0, length - tile_size, stride))
+    origins.append(length - tile_size)
+    return origins
+
+
+def make_tiles(image: np.ndarray, tile_size: int = DEFAULT_TILE_SIZE, overlap: float = DEFAULT_TILE_OVERLAP) -> list:
+    """
+    Cuts an image into overlapping tile_size x tile_size views.
+    Returns a list of (x_offset, y_offset, tile) tuples; tiles are views, not copies.
+    """
+    height, width = image.shape[:2]
+    stride = max(1, int(tile_size * (1 - overlap)))
+    return [
+        (x, y, image[y:y + tile_size, x:x + tile_size])
+        for y in _tile_origins(height, tile_size, stride)
+        for x in _tile_origins(width, tile_size, stride)
+    ]
+
+
+def _nms(boxes: np.ndarray, scores: np.ndarray, class_ids: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """
+    Class-aware non-maximum suppression. Returns the indices of the boxes to keep.
+    Boxes of different classes are shifted apart so they never suppress each other.
+    """
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    offsets = class_ids.astype(np.float64)[:, None] * (boxes.max() + 1)
+    shifted = boxes + offsets
+    areas = (shifted[:, 2] - shifted[:, 0]) * (shifted[:, 3] - shifted[:, 1])
+    order = scores.argsort()[::-1]
+
+    keep = []
+    while order.size:
+        best = order[0]
+        keep.append(best)
+        rest = order[1:]
+        xx1 = np.maximum(shifted[best, 0], shifted[rest, 0])
+        yy1 = np.maximum(shifted[best, 1], shifted[rest, 1])
+        xx2 = np.minimum(shifted[best, 2], shifted[rest, 2])
+        yy2 = np.minimum(shifted[best, 3], shifted[rest, 3])
+        intersection = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        iou = intersection / (areas[best] + areas[rest] - intersection + 1e-9)
+        order = rest[iou <= iou_threshold]
+
+    return np.asarray(keep, dtype=np.int64)
+
+
+def detect_boxes_tiled(model: YOLO, image, tile_size: int = DEFAULT_TILE_SIZE, overlap: float = DEFAULT_TILE_OVERLAP,
+                       batch_size: int = DEFAULT_BATCH_SIZE, iou_threshold: float = TILE_NMS_IOU,
+                       stats: dict | None = None) -> tuple:
+    """
+    Sliced inference for large images: runs the model on overlapping full-resolution
+    tiles instead of letting ultralytics downscale the whole photo, so small litter
+    stays visible. Tile boxes are shifted back to image coordinates and merged with
+    class-aware NMS across tiles.
+
+    Args:
+        image: Path, encoded bytes or BGR array.
+        stats: Optional dict, filled with the tile count and per-stage timings (seconds).
+
+    Returns:
+        (xyxy, class ids, confidences) arrays like detect_boxes, in full-image coordinates.
+    """
+    timings = {"tiles": 0, "decode_s": 0.0, "tiling_s": 0.0, "inference_s": 0.0, "merge_s": 0.0}
+    try:
+        started = time.perf_counter()
+        if isinstance(image, str):
+            image = read_image(image)
+        else:
+            image = _prepare_source(image)
+        timings["decode_s"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        tiles = make_tiles(image, tile_size=tile_size, overlap=overlap)
+        timings["tiles"] = len(tiles)
+        timings["tiling_s"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        all_boxes, all_scores, all_classes = [], [], []
+        for start in range(0, len(tiles), max(1, int(batch_size))):
+            chunk = tiles[start:start + batch_size]
+            results = model.predict(
+                source=[tile for _, _, tile in chunk],
+                conf=CONF_THRESHOLD,
+                imgsz=tile_size,
+                batch=len(chunk),
+                verbose=False
+            )
+            for (x_offset, y_offset, _), result in zip(chunk, results or []):
+                if result.boxes is None or len(result.boxes) == 0:
+                    continue
+                boxes = result.boxes.xyxy.cpu().numpy().astype(np.float64)
+                boxes[:, [0, 2]] += x_offset
+                boxes[:, [1, 3]] += y_offset
+                all_boxes.append(boxes)
+                all_scores.append(result.boxes.conf.cpu().numpy())
+                all_classes.append(result.boxes.cls.cpu().numpy().astype(int))
+        timings["inference_s"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        merged = EMPTY_BOXES
+        if all_boxes:
+            boxes = np.concatenate(all_boxes)
+            scores = np.concatenate(all_scores)
+            class_ids = np.concatenate(all_classes)
+            keep = _nms(boxes, scores, class_ids, iou_threshold)
+            merged = (boxes[keep], class_ids[keep], scores[keep])
+        timings["merge_s"] = time.perf_counter() - started
+        return merged
+    finally:
+        if stats is not None:
+            stats.update(timings)
+
+
+def run_detection_tiled(model: YOLO, image, tile_size: int = DEFAULT_TILE_SIZE, overlap: float = DEFAULT_TILE_OVERLAP,
+                        batch_size: int = DEFAULT_BATCH_SIZE, iou_threshold: float = TILE_NMS_IOU,
+                        stats: dict | None = None) -> list:
+    """
+    Same as detect_boxes_tiled, returning detection dicts in the format of run_detection.
+    """
+    try:
+        boxes = detect_boxes_tiled(
+            model, image, tile_size=tile_size, overlap=overlap, batch_size=batch_size,
+            iou_threshold=iou_threshold, stats=stats
+        )
+        return to_detections(boxes, model.names)
+    except Exception as e:
+        print(f"❌ Error during tiled YOLO detection: {e}")
+        return []
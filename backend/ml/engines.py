@@ -0,0 +1,136 @@
+# backend/ml/engines.py
+import os
+import fcntl
+import shutil
+import tempfile
+from contextlib import contextmanager
+from ultralytics import YOLO
+
+# Engine name -> ultralytics export format. "torch" runs the .pt weights directly.
+ENGINE_FORMATS = {
+    "torch": None,
+    "onnx": "onnx",          # runs through ONNX Runtime (CPUExecutionProvider)
+    "openvino": "openvino",  # runs through the OpenVINO runtime
+    "onnx-int8": "onnx",     # INT8-quantised ONNX (see ml/quantize.py), ONNX Runtime
+}
+
+def exported_model_path(weights_path: str, engine: str) -> str:
+    """
+    Returns where ultralytics writes (and where we look for) the exported model.
+    """
+    stem = os.path.splitext(weights_path)[0]
+    if engine == "onnx":
+        return f"{stem}.onnx"
+    if engine == "openvino":
+        return f"{stem}_openvino_model"
+    if engine == "onnx-int8":
+        return f"{stem}_int8.onnx"
+    return weights_path
+
+def setup_predictor(model: YOLO):
+    """
+    Builds the model's predictor now rather than on its first predict(). For .pt weights
+    that step deep-copies the network and fuses Conv+BN into new tensors, so when it runs
+    before a fork the children share the fused weights copy-on-write instead of each
+    writing its own copy. predict() keeps reusing this predictor as long as it isn't
+    called with different device / precision settings.
+    """
+    args = {**model.overrides, "conf": 0.25, "batch": 1, "save": False, "mode": "predict", "rect": True}
+    model.predictor = model._smart_load("predictor")(overrides=args, _callbacks=model.callbacks)
+    model.predictor.setup_model(model=model.model, verbose=False)
+
+def _replace(source: str, target: str):
+    # os.replace can't overwrite a non-empty directory (the OpenVINO export is one)
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    os.replace(source, target)
+
+def export_model(weights_path: str, engine: str, imgsz: int = 640) -> str:
+    """
+    Exports the PyTorch weights to the given engine's format and returns the exported path.
+    Dynamic axes are enabled so the exported model still accepts batched input.
+
+    The export is written in a scratch directory next to the weights and moved into
+    place with one rename, so a process loading the model never sees it half-written.
+    """
+    export_format = ENGINE_FORMATS[engine]
+    target = exported_model_path(weights_path, engine)
+    print(f"🔧 Exporting {weights_path} to {engine} (imgsz={imgsz})...")
+    staging_dir = tempfile.mkdtemp(prefix=".export-", dir=os.path.dirname(os.path.abspath(weights_path)))
+    try:
+        # ultralytics writes the export next to the weights it was given
+        staged_weights = os.path.join(staging_dir, os.path.basename(weights_path))
+        shutil.copyfile(weights_path, staged_weights)
+        exported = YOLO(staged_weights).export(format=export_format, imgsz=imgsz, dynamic=True)
+        _replace(str(exported), target)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+    print(f"✅ Exported model written to {target}")
+    return target
+
+@contextmanager
+def export_lock(model_path: str):
+    """
+    Exclusive lock for building model_path: prefork children all load the model at the
+    same moment, and only one of them may export it while the others wait.
+    """
+    with open(f"{model_path}.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def ensure_exported(weights_path: str, engine: str, imgsz: int = 640,
+                    quant_mode: str = "dynamic", calibration_dir: str | None = None) -> str:
+    """
+    Returns the engine's model file for the weights, building it first if it doesn't exist.
+    """
+    model_path = exported_model_path(weights_path, engine)
+    if os.path.exists(model_path):
+        return model_path
+    with export_lock(model_path):
+        # another process may have built it while we waited for the lock
+        if os.path.exists(model_path):
+            return model_path
+        if engine == "onnx-int8":
+            from .quantize import quantize_model
+            return quantize_model(weights_path, mode=quant_mode, calibration_dir=calibration_dir, imgsz=imgsz)
+        return export_model(weights_path, engine, imgsz=imgsz)
+
+def load_model(engine: str, weights_path: str, imgsz: int = 640,
+               quant_mode: str = "dynamic", calibration_dir: str | None = None) -> YOLO:
+    """
+    Loads the waste model for the requested engine, exporting it first if needed.
+
+    Every engine is wrapped in an ultralytics YOLO object, so predict() returns the
+    same Results objects and detection.detect_boxes produces the same box arrays for
+    reconstruction.estimate_volume_from_boxes regardless of the backend.
+    """
+    if engine not in ENGINE_FORMATS:
+        raise ValueError(f"Unknown inference engine '{engine}'. Expected one of {sorted(ENGINE_FORMATS)}.")
+
+    if engine == "torch":
+        return YOLO(weights_path)
+
+    model_path = ensure_exported(
+        weights_path, engine, imgsz=imgsz, quant_mode=quant_mode, calibration_dir=calibration_dir
+    )
+
+    # set the task explicitly so ultralytics doesn't have to guess it from the exported file
+    return YOLO(model_path, task="detect")
+
+
+if __name__ == "__main__":
+    # Ahead-of-time export, e.g. `python -m ml.engines onnx` from backend/
+    import sys
+    from .config import ml_settings
+
+    target = sys.argv[1] if len(sys.argv) > 1 else ml_settings.ENGINE
+    if target == "torch":
+        print("Nothing to export for the torch engine.")
+    elif target == "onnx-int8":
+        print("Use `python -m ml.quantize` to build the INT8 model.")
+    else:
+        with export_lock(exported_model_path(ml_settings.MODEL_PATH, target)):
+            export_model(ml_settings.MODEL_PATH, target, imgsz=ml_settings.EXPORT_IMGSZ)
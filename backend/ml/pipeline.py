@@ -1,81 +1,706 @@
 # backend/ml/pipeline.py
 import os
+import gc
+import csv
+import json
 import glob
-import pandas as pd
-from ultralytics import YOLO
+import time
+import argparse
+import threading
+import multiprocessing
+import numpy as np
 from . import detection
 from . import reconstruction
+from . import engines
+from . import cache
+from . import registry
+from .config import ml_settings
 
 # --- MODEL LOADING ---
-# This loads the model once, making it efficient for the worker and tests.
-MODEL_PATH = "ml/models/best.pt"
-MODEL = YOLO(MODEL_PATH)
-print("✅ YOLO model loaded successfully into pipeline.")
+# The model is loaded lazily, once per process: on first use, or up front from the
+# Celery worker_process_init / worker_init hooks (see celery_worker.py).
+# The engine (torch / onnx / openvino / onnx-int8) is picked with the ML_ENGINE setting.
+# If a model registry is set up (ML_REGISTRY_DIR, see ml/registry.py) its active
+# version is used instead of MODEL_PATH and new versions are hot-swapped in.
+MODEL_PATH = ml_settings.MODEL_PATH
 
-def process_waste_image(image_path: str, save_detections: bool = False) -> float:
+_model = None
+_model_warmed_up = False
+_model_lock = threading.Lock()
+# (version, model) loaded and warmed up in the background, waiting to be swapped in
+_staged_model = None
+# the registry watcher thread and the process it was started in (threads don't survive fork)
+_watcher = None
+_watcher_pid = None
+_watcher_lock = threading.Lock()
+
+# Load / warm-up timings for the model in this process
+MODEL_STATS = {
+    "engine": ml_settings.ENGINE,
+    "version": None,
+    "pid": None,
+    "load_seconds": None,
+    "warmup_seconds": None,
+    "swaps": 0,
+}
+
+def _resolve_weights() -> tuple:
+    """
+    Returns (version, weights path): the registry's active version if there is one,
+    else MODEL_PATH labelled with its file name.
+    """
+    if registry.enabled():
+        version, weights_path = registry.active_version()
+        if version:
+            return version, weights_path
+    return os.path.basename(MODEL_PATH), MODEL_PATH
+
+def _load_weights(weights_path: str):
+    return engines.load_model(
+        ml_settings.ENGINE, weights_path, imgsz=ml_settings.EXPORT_IMGSZ,
+        quant_mode=ml_settings.QUANT_MODE, calibration_dir=ml_settings.QUANT_CALIBRATION_DIR
+    )
+
+def _run_warmup(model):
+    dummy = np.zeros((ml_settings.WARMUP_IMGSZ, ml_settings.WARMUP_IMGSZ, 3), dtype=np.uint8)
+    for _ in range(ml_settings.WARMUP_RUNS):
+        model.predict(source=dummy, imgsz=ml_settings.WARMUP_IMGSZ, verbose=False)
+
+def load_model():
+    """
+    Loads the model into this process if it isn't loaded yet (no warm-up) and returns it.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                started = time.perf_counter()
+                version, weights_path = _resolve_weights()
+                _model = _load_weights(weights_path)
+                MODEL_STATS["version"] = version
+                MODEL_STATS["pid"] = os.getpid()
+                MODEL_STATS["load_seconds"] = time.perf_counter() - started
+                print(f"✅ YOLO model {version} loaded successfully into pipeline ({ml_settings.ENGINE} engine) "
+                      f"in {MODEL_STATS['load_seconds']:.2f}s [pid {os.getpid()}].")
+    return _model
+
+def warm_up_model():
+    """
+    Runs ML_WARMUP_RUNS dummy inferences so the first real scan doesn't pay for
+    lazy kernel / thread-pool initialisation.
+    """
+    global _model_warmed_up
+    model = load_model()
+    with _model_lock:
+        if _model_warmed_up:
+            return
+        started = time.perf_counter()
+        _run_warmup(model)
+        _model_warmed_up = True
+        MODEL_STATS["warmup_seconds"] = time.perf_counter() - started
+    print(f"🔥 Model warm-up ({ml_settings.WARMUP_RUNS} runs) took {MODEL_STATS['warmup_seconds']:.2f}s [pid {os.getpid()}].")
+
+def _promote_staged_model():
+    global _model, _model_warmed_up, _staged_model
+    with _model_lock:
+        if _staged_model is None:
+            return
+        version, model = _staged_model
+        previous = MODEL_STATS["version"]
+        _model, _model_warmed_up, _staged_model = model, True, None
+        MODEL_STATS["version"] = version
+        MODEL_STATS["swaps"] += 1
+    # results of the previous model must not be served for the new one
+    if INFERENCE_CACHE is not None:
+        INFERENCE_CACHE.clear()
+    print(f"🔁 Switched model {previous} -> {version} [pid {os.getpid()}].")
+
+def get_model():
+    """
+    Returns the loaded, warmed-up model for this process. A model version staged
+    by the registry watcher is swapped in here; the pipeline calls it once per image
+    or batch (see current_model), so a swap happens between tasks, never mid-inference.
+    The first call in each process also starts that watcher, whatever the pool type.
+    """
+    if _watcher_pid != os.getpid():
+        start_registry_watcher()
+    if _staged_model is not None:
+        _promote_staged_model()
+    if not _model_warmed_up:
+        warm_up_model()
+    return _model
+
+def current_model() -> tuple:
+    """
+    (model, version) for one pipeline call, read together so a result is never
+    labelled with a version other than the one that produced it.
+    """
+    get_model()
+    with _model_lock:
+        return _model, MODEL_STATS["version"]
+
+def model_version() -> str | None:
+    """
+    Version of the model currently serving this process (recorded on each ScanResult).
+    """
+    return MODEL_STATS["version"]
+
+def _watch_registry():
+    global _staged_model
+    last_mtime = registry.manifest_mtime()
+    while True:
+        time.sleep(ml_settings.REGISTRY_POLL_SECONDS)
+        mtime = registry.manifest_mtime()
+        if mtime is None or mtime == last_mtime:
+            continue
+        last_mtime = mtime
+        try:
+            version, weights_path = registry.active_version()
+            staged_version = _staged_model[0] if _staged_model else None
+            if not version or version in (MODEL_STATS["version"], staged_version):
+                continue
+            print(f"📦 New active model version {version}; loading in the background [pid {os.getpid()}].")
+            started = time.perf_counter()
+            model = _load_weights(weights_path)
+            _run_warmup(model)
+            with _model_lock:
+                _staged_model = (version, model)
+            print(f"📦 Model {version} ready after {time.perf_counter() - started:.2f}s; switching before the next task.")
+        except Exception as e:
+            print(f"❌ Could not load model version from registry: {e}")
+
+def start_registry_watcher() -> threading.Thread | None:
+    """
+    Starts a daemon thread that polls the registry manifest and stages newly
+    activated versions, once per process (get_model calls it, so forked pool
+    children, solo and thread pools all get one). Returns the thread, or None
+    if no registry is set up.
+    """
+    global _watcher, _watcher_pid
+    with _watcher_lock:
+        if _watcher_pid == os.getpid():
+            return _watcher
+        _watcher, _watcher_pid = None, os.getpid()
+        if registry.enabled():
+            _watcher = threading.Thread(target=_watch_registry, name="model-registry-watcher", daemon=True)
+            _watcher.start()
+        return _watcher
+
+def set_model(model, version: str = "custom", warm_up: bool = True):
+    """
+    Installs an already-constructed model for this process (e.g. a stand-in model
+    for benchmarks), replacing whatever was loaded.
+    """
+    global _model, _model_warmed_up
+    with _model_lock:
+        _model = model
+        _model_warmed_up = False
+        MODEL_STATS["version"] = version
+        MODEL_STATS["pid"] = os.getpid()
+    if warm_up:
+        warm_up_model()
+
+def preload_model_for_fork():
+    """
+    Loads the weights in the parent process before the worker forks its children,
+    so they share the weight pages copy-on-write instead of each loading its own copy.
+    No warm-up here: running inference before fork starts thread pools that don't
+    survive fork safely, so each child warms up after it starts.
+    """
+    model = load_model()
+    if ml_settings.ENGINE == "torch":
+        # the first predict() copies and fuses the weights; do that once, here
+        engines.setup_predictor(model)
+    # Move everything allocated so far out of the GC's generations so collections
+    # in the children don't touch (and un-share) those pages.
+    gc.freeze()
+
+def __getattr__(name):
+    # Backwards compatibility for code that still reads pipeline.MODEL
+    if name == "MODEL":
+        return get_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# --- INFERENCE CACHE ---
+# Re-submitted / replayed photos are answered from here without running the model.
+INFERENCE_CACHE = cache.InferenceCache(
+    max_entries=ml_settings.CACHE_MAX_ENTRIES,
+    ttl_seconds=ml_settings.CACHE_TTL_SECONDS,
+    phash_max_distance=ml_settings.CACHE_PHASH_MAX_DISTANCE,
+    redis_url=ml_settings.REDIS_URL if ml_settings.CACHE_USE_REDIS else None,
+) if ml_settings.CACHE_ENABLED else None
+
+def _cache_keys(image, version: str | None, content_hash: str | None = None):
+    """
+    Returns (sha256, phash, image). When a perceptual hash is needed the image is
+    decoded here, and the decoded array is handed back so it isn't decoded twice.
+    """
+    # keyed per model version so a hot-swapped model never serves its predecessor's results
+    key = f"{version}:{content_hash or cache.content_hash(image)}"
+    phash = None
+    if ml_settings.CACHE_PHASH_MAX_DISTANCE is not None:
+        try:
+            if isinstance(image, (bytes, bytearray, memoryview)):
+                image = detection.decode_image(bytes(image))
+            elif isinstance(image, str):
+                image = detection.read_image(image)
+            phash = cache.perceptual_hash(image)
+        except ValueError as e:
+            print(f"⚠️ Skipping perceptual hash: {e}")
+    return key, phash, image
+
+# --- CLEAN-IMAGE PRE-FILTER ---
+# Counters for the optional low-resolution gate in front of full detection, per process;
+# the Celery worker exports them to Prometheus (see app/core/metrics.export_prefilter_stats)
+PREFILTER_STATS = {
+    "checked": 0,
+    "skipped": 0,
+    "prefilter_seconds": 0.0,
+    "detections_run": 0,
+    "detection_seconds": 0.0,
+}
+
+def _prefilter_clean(model, images: list) -> list:
+    """
+    Returns one bool per image: True if the low-resolution pass is confident the
+    image is clean and full detection can be skipped. All False when disabled.
+    """
+    if not ml_settings.PREFILTER_ENABLED or not images:
+        return [False] * len(images)
+    started = time.perf_counter()
+    try:
+        scores = detection.score_waste_presence(model, images, imgsz=ml_settings.PREFILTER_IMGSZ)
+    except Exception as e:
+        print(f"⚠️ Pre-filter failed, running full detection: {e}")
+        return [False] * len(images)
+    finally:
+        PREFILTER_STATS["prefilter_seconds"] += time.perf_counter() - started
+    clean = [score < ml_settings.PREFILTER_THRESHOLD for score in scores]
+    PREFILTER_STATS["checked"] += len(images)
+    PREFILTER_STATS["skipped"] += sum(clean)
+    return clean
+
+def prefilter_stats() -> dict:
+    """
+    Pre-filter threshold, hit rate (share of images skipped) and estimated time saved:
+    skipped images x average full-detection time, minus the time spent in the gate.
+    """
+    stats = dict(PREFILTER_STATS)
+    average_detection_s = stats["detection_seconds"] / stats["detections_run"] if stats["detections_run"] else 0.0
+    stats.update({
+        "enabled": ml_settings.PREFILTER_ENABLED,
+        "threshold": ml_settings.PREFILTER_THRESHOLD,
+        "imgsz": ml_settings.PREFILTER_IMGSZ,
+        "hit_rate": stats["skipped"] / stats["checked"] if stats["checked"] else 0.0,
+        "estimated_seconds_saved": stats["skipped"] * average_detection_s - stats["prefilter_seconds"],
+    })
+    return stats
+
+def _detect(model, image, save_detections: bool = False) -> tuple:
+    """
+    Runs detection on one image and returns its (xyxy, class ids, confidences) arrays:
+    skipped if the pre-filter says it's clean, and switched to tiled inference for
+    large images when ML_TILED_INFERENCE is on.
+    """
+    if not save_detections and _prefilter_clean(model, [image])[0]:
+        print("-> Pre-filter: image looks clean, skipping full detection.")
+        return detection.EMPTY_BOXES
+    started = time.perf_counter()
+    try:
+        return _run_full_detection(model, image, save_detections)
+    finally:
+        PREFILTER_STATS["detections_run"] += 1
+        PREFILTER_STATS["detection_seconds"] += time.perf_counter() - started
+
+def _decoded(image) -> np.ndarray:
+    # tiling needs the image's size, so paths and encoded bytes are decoded up front
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return detection.decode_image(bytes(image))
+    if isinstance(image, str):
+        return detection.read_image(image)
+    return image
+
+def _needs_tiling(image: np.ndarray) -> bool:
+    return max(image.shape[:2]) >= ml_settings.TILE_MIN_EDGE
+
+def _detect_tiled(model, image: np.ndarray) -> tuple:
+    tiling_stats = {}
+    boxes = detection.detect_boxes_tiled(
+        model, image, tile_size=ml_settings.TILE_SIZE,
+        overlap=ml_settings.TILE_OVERLAP, stats=tiling_stats
+    )
+    print(f"-> Tiled inference: {tiling_stats['tiles']} tiles, "
+          f"tiling {tiling_stats['tiling_s'] * 1000:.1f} ms, "
+          f"inference {tiling_stats['inference_s'] * 1000:.1f} ms, "
+          f"merge {tiling_stats['merge_s'] * 1000:.1f} ms")
+    return boxes
+
+def _run_full_detection(model, image, save_detections: bool = False) -> tuple:
+    if ml_settings.TILED_INFERENCE and not save_detections:
+        image = _decoded(image)
+        if _needs_tiling(image):
+            return _detect_tiled(model, image)
+    return detection.detect_boxes(model, image, save_output=save_detections)
+
+def _volume_breakdown(boxes: tuple, names) -> dict:
+    # estimate_volume_from_boxes on detection arrays, with class ids mapped to label names
+    xyxy, class_ids, _ = boxes
+    return reconstruction.estimate_volume_from_boxes(xyxy, [names[class_id] for class_id in class_ids.tolist()])
+
+def _rescale_output(output: dict, pixel_scale: float) -> dict:
+    # volumes in the cache are per pixel of the image itself; scale them to the original photo
+    if pixel_scale == 1.0 or output["volume_cm3"] is None:
+        return output
+    return dict(
+        output,
+        volume_cm3=reconstruction.rescale_volume(output["volume_cm3"], pixel_scale),
+        volume_by_label={
+            label: reconstruction.rescale_volume(volume, pixel_scale)
+            for label, volume in output["volume_by_label"].items()
+        }
+    )
+
+def process_waste_image(image, save_detections: bool = False, content_hash: str | None = None,
+                        timings: dict | None = None, pixel_scale: float = 1.0) -> float:
     """
     The main pipeline function that orchestrates the entire ML process for one image.
+    `image` can be a file path, encoded image bytes or an already decoded BGR array.
+    `content_hash` is the SHA-256 of the original bytes, if the caller already has it.
+    `timings`, if given, is filled with per-stage seconds ("detection", "reconstruction"),
+    "cache_hit" and the "model_version" that produced the result.
+    `pixel_scale` is original photo pixels per pixel of `image`, for images downscaled
+    at ingest (see reconstruction.PIXEL_TO_CM).
+    Raises if detection fails; only real results are cached, so a transient inference
+    error is never remembered as a clean image.
     """
-    print(f"🚀 Starting ML pipeline for: {os.path.basename(image_path)}")
+    if timings is None:
+        timings = {}
+    # one model for the whole call: a staged version is only swapped in before it
+    model, version = current_model()
+    timings.update({"detection": 0.0, "reconstruction": 0.0, "cache_hit": False, "model_version": version})
+    label = os.path.basename(image) if isinstance(image, str) else "in-memory image"
+    print(f"🚀 Starting ML pipeline for: {label}")
+
+    # Step 0: Answer from the inference cache if we've seen this image before
+    cache_key = phash = None
+    if INFERENCE_CACHE is not None and not save_detections:
+        cache_key, phash, image = _cache_keys(image, version, content_hash)
+        cached = INFERENCE_CACHE.get(cache_key, phash)
+        if cached is not None:
+            print(f"-> Cache hit: {len(cached['detections'])} waste objects, {cached['volume_cm3']:.2f} cm³")
+            timings["cache_hit"] = True
+            return reconstruction.rescale_volume(cached["volume_cm3"], pixel_scale)
     
     # Step 1: Run 2D detection to get bounding boxes
-    detection_results = detection.run_detection(MODEL, image_path, save_output=save_detections)
+    started = time.perf_counter()
+    boxes = _detect(model, image, save_detections=save_detections)
+    timings["detection"] = time.perf_counter() - started
     
-    if not detection_results:
+    xyxy = boxes[0]
+    if not len(xyxy):
         print("-> No waste detected in image.")
-        return 0.0
-    
-    print(f"-> Found {len(detection_results)} waste objects.")
+        waste_volume_cm3 = 0.0
+    else:
+        print(f"-> Found {len(xyxy)} waste objects.")
 
-    # Step 2: Pass detection results to the reconstruction logic
-    waste_volume_cm3 = reconstruction.estimate_volume_from_detections(detection_results)
-    
-    print(f"-> Estimated waste volume: {waste_volume_cm3:.2f} cm³")
+        # Step 2: Pass the box array straight to the reconstruction logic
+        started = time.perf_counter()
+        waste_volume_cm3 = reconstruction.estimate_volume_from_boxes(xyxy)["total_cm3"]
+        timings["reconstruction"] = time.perf_counter() - started
+        print(f"-> Estimated waste volume: {waste_volume_cm3:.2f} cm³")
+
+    if cache_key is not None:
+        # detection dicts are only built for the cache
+        detection_results = detection.to_detections(boxes, model.names)
+        INFERENCE_CACHE.put(cache_key, {"detections": detection_results, "volume_cm3": waste_volume_cm3}, phash)
+    if pixel_scale != 1.0:
+        waste_volume_cm3 = reconstruction.rescale_volume(waste_volume_cm3, pixel_scale)
+        print(f"-> Volume at original resolution (x{pixel_scale:.2f}): {waste_volume_cm3:.2f} cm³")
     return waste_volume_cm3
 
+def process_waste_images(images: list, batch_size: int = detection.DEFAULT_BATCH_SIZE, save_detections: bool = False,
+                         content_hashes: list | None = None, pixel_scales: list | None = None) -> list:
+    """
+    Batched version of process_waste_image.
+
+    Takes a list of image paths, encoded bytes or NumPy arrays and runs them
+    through the model batch_size at a time. Returns one dict per input, in order:
+    {"detections": [...], "volume_cm3": float, "volume_by_label": {label: float}, "error": None,
+     "model_version": str}
+    An image whose detection failed gets volume_cm3 None and the error message, and
+    is not cached. Cached images are answered directly and left out of the model batches.
+    With ML_TILED_INFERENCE on, images of at least TILE_MIN_EDGE pixels go through tiled
+    inference one at a time instead, as in process_waste_image.
+    content_hashes, if given, are the images' precomputed SHA-256s, and pixel_scales their
+    ingest downscale factors (see process_waste_image).
+    """
+    print(f"🚀 Starting batched ML pipeline for {len(images)} images (batch size {batch_size})")
+
+    # one model for the whole call: a staged version is only swapped in before it
+    model, version = current_model()
+    outputs = [None] * len(images)
+    cache_entries = [(None, None)] * len(images)
+    pending = []
+    for i, image in enumerate(images):
+        if INFERENCE_CACHE is not None and not save_detections:
+            cache_key, phash, image = _cache_keys(image, version, content_hashes[i] if content_hashes else None)
+            cache_entries[i] = (cache_key, phash)
+            cached = INFERENCE_CACHE.get(cache_key, phash)
+            if cached is not None:
+                volume = reconstruction.estimate_volume_breakdown(cached["detections"])
+                outputs[i] = {
+                    "detections": cached["detections"],
+                    "volume_cm3": cached["volume_cm3"],
+                    "volume_by_label": volume["by_label"],
+                    "error": None
+                }
+                continue
+        pending.append((i, image))
+
+    skipped = 0
+    if pending and not save_detections:
+        clean = _prefilter_clean(model, [image for _, image in pending])
+        for (i, _), is_clean in zip(pending, clean):
+            if is_clean:
+                outputs[i] = {"detections": [], "volume_cm3": 0.0, "volume_by_label": {}, "error": None}
+                cache_key, phash = cache_entries[i]
+                if cache_key is not None:
+                    INFERENCE_CACHE.put(cache_key, {"detections": [], "volume_cm3": 0.0}, phash)
+        skipped = sum(clean)
+        pending = [entry for entry, is_clean in zip(pending, clean) if not is_clean]
+
+    if pending:
+        started = time.perf_counter()
+        detected, batched = [], pending
+        if ml_settings.TILED_INFERENCE and not save_detections:
+            batched = []
+            for i, image in pending:
+                try:
+                    image = _decoded(image)
+                    if not _needs_tiling(image):
+                        batched.append((i, image))
+                        continue
+                    detected.append((i, _detect_tiled(model, image)))
+                except Exception as e:
+                    # like detect_boxes_batch: the error is this image's result
+                    print(f"❌ Error during YOLO detection: {e}")
+                    detected.append((i, e))
+        if batched:
+            batch_boxes = detection.detect_boxes_batch(
+                model, [image for _, image in batched], batch_size=batch_size, save_output=save_detections
+            )
+            detected += [(i, boxes) for (i, _), boxes in zip(batched, batch_boxes)]
+        PREFILTER_STATS["detections_run"] += len(pending)
+        PREFILTER_STATS["detection_seconds"] += time.perf_counter() - started
+        for i, boxes in detected:
+            if isinstance(boxes, Exception):
+                outputs[i] = {"detections": [], "volume_cm3": None, "volume_by_label": {}, "error": str(boxes)}
+                continue
+            volume = _volume_breakdown(boxes, model.names)
+            detection_results = detection.to_detections(boxes, model.names)
+            outputs[i] = {
+                "detections": detection_results,
+                "volume_cm3": volume["total_cm3"],
+                "volume_by_label": volume["by_label"],
+                "error": None
+            }
+            cache_key, phash = cache_entries[i]
+            if cache_key is not None:
+                INFERENCE_CACHE.put(cache_key, {"detections": detection_results, "volume_cm3": volume["total_cm3"]}, phash)
+
+    for output in outputs:
+        output["model_version"] = version
+    if pixel_scales:
+        outputs = [_rescale_output(output, pixel_scale) for output, pixel_scale in zip(outputs, pixel_scales)]
+    print(f"-> Processed {len(outputs)} images ({len(images) - len(pending) - skipped} from cache, "
+          f"{skipped} skipped as clean), "
+          f"{sum(1 for o in outputs if o['detections'])} with waste, "
+          f"{sum(1 for o in outputs if o['error'])} failed.")
+    return outputs
+
 # ====================================================================
 # MAIN TEST RUNNER BLOCK
-# This code only runs when you execute the script directly for testing.
+# This code only runs when you execute the script directly for testing,
+# or for offline audits over large image archives:
+#   python -m ml.pipeline                                   (ml/test_images -> CSV)
+#   python -m ml.pipeline /archive/2025 --workers 8 --output audit.ndjson
+#   python -m ml.pipeline "/archive/**/*.jpg" --output audit.csv --resume
 # ====================================================================
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+OUTPUT_FIELDS = ["image_path", "image_filename", "estimated_volume_cm3", "num_detections", "error"]
+
+def _iter_image_paths(source: str):
+    """
+    Lazily yields image paths from a directory (recursively) or a glob pattern.
+    """
+    if os.path.isdir(source):
+        for root, _, files in os.walk(source):
+            for name in sorted(files):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield os.path.join(root, name)
+    else:
+        for path in glob.iglob(source, recursive=True):
+            if path.lower().endswith(IMAGE_EXTENSIONS):
+                yield path
+
+def _chunks(paths, size: int):
+    chunk = []
+    for path in paths:
+        chunk.append(path)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _init_cli_worker(threads_per_worker: int):
+    """
+    Pool initializer: each process loads (and warms up) its own model, using a
+    share of the cores so N processes don't oversubscribe the CPU.
+    """
+    try:
+        import torch
+        torch.set_num_threads(threads_per_worker)
+    except ImportError:
+        pass
+    get_model()
+
+def _process_chunk(args) -> list:
+    paths, save_detections = args
+    try:
+        outputs = process_waste_images(paths, batch_size=len(paths), save_detections=save_detections)
+        return [
+            {
+                "image_path": path,
+                "image_filename": os.path.basename(path),
+                "estimated_volume_cm3": output["volume_cm3"],
+                "num_detections": None if output["error"] else len(output["detections"]),
+                "error": output["error"] or "",
+            }
+            for path, output in zip(paths, outputs)
+        ]
+    except Exception as e:
+        return [
+            {"image_path": path, "image_filename": os.path.basename(path),
+             "estimated_volume_cm3": None, "num_detections": None, "error": str(e)}
+            for path in paths
+        ]
+
+def _read_done_paths(output_path: str) -> set:
+    """
+    Image paths already processed successfully in an earlier (possibly interrupted)
+    output file. Rows with an error don't count, so --resume retries those images.
+    """
+    if not os.path.exists(output_path):
+        return set()
+    done = set()
+    with open(output_path, newline="") as f:
+        if output_path.endswith(".ndjson"):
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by the interruption
+                if isinstance(row, dict) and row.get("image_path") and not row.get("error"):
+                    done.add(row["image_path"])
+        else:
+            for row in csv.DictReader(f):
+                if row.get("image_path") and not row.get("error"):
+                    done.add(row["image_path"])
+    return done
+
+class _ResultWriter:
+    """
+    Appends result rows to a CSV or NDJSON file as they arrive, flushing each
+    batch so an interrupted run loses at most the chunks in flight.
+    """
+
+    def __init__(self, output_path: str, append: bool):
+        self.ndjson = output_path.endswith(".ndjson")
+        has_rows = append and os.path.exists(output_path) and os.path.getsize(output_path) > 0
+        needs_newline = False
+        if has_rows:
+            with open(output_path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                # the interrupted run may have left a half-written last line
+                needs_newline = f.read(1) != b"\n"
+        self._file = open(output_path, "a" if append else "w", newline="")
+        if needs_newline:
+            self._file.write("\n")
+        write_header = not has_rows
+        if not self.ndjson:
+            self._writer = csv.DictWriter(self._file, fieldnames=OUTPUT_FIELDS)
+            if write_header:
+                self._writer.writeheader()
+
+    def write(self, rows: list):
+        for row in rows:
+            if self.ndjson:
+                self._file.write(json.dumps(row) + "\n")
+            else:
+                self._writer.writerow(row)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
 def main():
     """
-    A function to test the pipeline on a directory of images.
+    Runs the pipeline over a directory or glob of images, spreading them over a
+    process pool (one model per process) and streaming results to CSV / NDJSON.
     """
-    # Define paths for test input and output
-    TEST_IMAGES_DIR = "ml/test_images"
-    OUTPUT_CSV_PATH = "ml/data/analysis_summary.csv"
-    
-    # Create the data output directory if it doesn't exist
-    os.makedirs("ml/data", exist_ok=True)
+    parser = argparse.ArgumentParser(description="Run the waste pipeline over a directory or glob of images.")
+    parser.add_argument("source", nargs="?", default="ml/test_images", help="Image directory or glob pattern.")
+    parser.add_argument("--output", default="ml/data/analysis_summary.csv", help="Output file (.csv or .ndjson).")
+    parser.add_argument("--workers", type=int, default=1, help="Number of processes, each with its own model.")
+    parser.add_argument("--batch-size", type=int, default=detection.DEFAULT_BATCH_SIZE, help="Images per model call.")
+    parser.add_argument("--resume", action="store_true", help="Skip images already in the output file and append.")
+    parser.add_argument("--save-detections", action="store_true", help="Also save annotated images.")
+    args = parser.parse_args()
 
-    # Find all image files in the test directory
-    image_paths = glob.glob(os.path.join(TEST_IMAGES_DIR, "*.jpg")) + \
-                  glob.glob(os.path.join(TEST_IMAGES_DIR, "*.png"))
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
 
-    if not image_paths:
-        print(f"❌ No images found in '{TEST_IMAGES_DIR}'. Please add images to test.")
+    done = _read_done_paths(args.output) if args.resume else set()
+    if done:
+        print(f"↩️ Resuming: {len(done)} images already in {args.output}")
+    pending = (path for path in _iter_image_paths(args.source) if path not in done)
+    chunks = ((chunk, args.save_detections) for chunk in _chunks(pending, max(1, args.batch_size)))
+
+    writer = _ResultWriter(args.output, append=args.resume)
+    processed = failed = 0
+    started = time.perf_counter()
+    pool = None
+    try:
+        if args.workers <= 1:
+            results = map(_process_chunk, chunks)
+        else:
+            threads_per_worker = max(1, (os.cpu_count() or 1) // args.workers)
+            pool = multiprocessing.Pool(args.workers, initializer=_init_cli_worker, initargs=(threads_per_worker,))
+            # unordered: rows are written as soon as any process finishes a chunk
+            results = pool.imap_unordered(_process_chunk, chunks)
+
+        for rows in results:
+            writer.write(rows)
+            processed += len(rows)
+            failed += sum(1 for row in rows if row["error"])
+            elapsed = time.perf_counter() - started
+            print(f"-> {processed} images done ({failed} failed), {processed / elapsed:.2f} images/sec")
+
+        if pool is not None:
+            pool.close()
+            pool.join()
+            pool = None
+    finally:
+        if pool is not None:
+            pool.terminate()
+        writer.close()
+
+    if not processed and not done:
+        print(f"❌ No images found in '{args.source}'. Please add images to test.")
         return
 
-    print(f"\nFound {len(image_paths)} images to process. Starting test run...\n")
-    
-    results_summary = []
-    # Loop through each image and process it
-    for img_path in image_paths:
-        volume = process_waste_image(img_path, save_detections=True)
-        results_summary.append({
-            "image_filename": os.path.basename(img_path),
-            "estimated_volume_cm3": volume
-        })
-        print("-" * 20)
-
-    # Save the summary to a CSV file
-    df_results = pd.DataFrame(results_summary)
-    df_results.to_csv(OUTPUT_CSV_PATH, index=False)
-
-    print("\n🎉 Test run complete!")
-    print(f"📊 Summary of results saved to: {OUTPUT_CSV_PATH}")
-    print("\nFinal Results:")
-    print(df_results)
+    print("\n🎉 Run complete!")
+    print(f"📊 Results saved to: {args.output} ({processed} new, {len(done)} from earlier runs)")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,247 @@
+# backend/ml/quantize.py
+"""
+INT8 quantisation tooling for the waste model.
+
+Produces an INT8 ONNX variant of best.pt with ONNX Runtime's quantiser, either
+dynamically (weights only, no data needed) or statically (weights + activations,
+calibrated on a local image folder; usually the faster and more accurate option
+for conv nets), and reports how it compares to the FP32 model on the same images:
+detection agreement, volume deltas and latency speedup.
+
+The INT8 model is used at runtime with ML_ENGINE=onnx-int8 (see ml/engines.py).
+
+Usage (from backend/):
+    python -m ml.quantize --mode static --calibration-dir ml/test_images
+    python -m ml.quantize --mode dynamic --report-only --images ml/test_images
+"""
+import os
+import glob
+import json
+import time
+import argparse
+
+import cv2
+import numpy as np
+
+from . import detection
+from . import engines
+from . import reconstruction
+from .config import ml_settings
+
+# Detections of the same label with at least this IoU count as "the same object"
+AGREEMENT_IOU = 0.5
+# Static calibration uses at most this many images from the folder
+MAX_CALIBRATION_IMAGES = 200
+
+
+def quantized_model_path(weights_path: str) -> str:
+    return engines.exported_model_path(weights_path, "onnx-int8")
+
+
+def _list_images(image_dir: str) -> list:
+    paths = []
+    for pattern in ("*.jpg", "*.jpeg", "*.png", "*.webp"):
+        paths.extend(glob.glob(os.path.join(image_dir, pattern)))
+    return sorted(paths)
+
+
+def _letterbox(image: np.ndarray, imgsz: int) -> np.ndarray:
+    """
+    Same preprocessing ultralytics applies before the network: aspect-preserving
+    resize, grey padding to imgsz x imgsz, RGB, CHW, scaled to [0, 1].
+    """
+    height, width = image.shape[:2]
+    scale = min(imgsz / height, imgsz / width)
+    new_w, new_h = int(round(width * scale)), int(round(height * scale))
+    resized = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top, left = (imgsz - new_h) // 2, (imgsz - new_w) // 2
+    canvas[top:top + new_h, left:left + new_w] = resized
+    tensor = canvas[:, :, ::-1].transpose(2, 0, 1).astype(np.float32) / 255.0
+    return np.ascontiguousarray(tensor[None])
+
+
+class FolderCalibrationReader:
+    """
+    onnxruntime CalibrationDataReader that feeds preprocessed images from a folder.
+    """
+
+    def __init__(self, image_dir: str, input_name: str, imgsz: int):
+        self.paths = _list_images(image_dir)[:MAX_CALIBRATION_IMAGES]
+        if not self.paths:
+            raise ValueError(f"No calibration images found in '{image_dir}'.")
+        self.input_name = input_name
+        self.imgsz = imgsz
+        self._iter = iter(self.paths)
+
+    def get_next(self):
+        for path in self._iter:
+            image = cv2.imread(path, cv2.IMREAD_COLOR)
+            if image is not None:
+                return {self.input_name: _letterbox(image, self.imgsz)}
+        return None
+
+    def rewind(self):
+        self._iter = iter(self.paths)
+
+
+def quantize_model(weights_path: str, mode: str = "dynamic", calibration_dir: str | None = None,
+                   imgsz: int = 640) -> str:
+    """
+    Builds the INT8 ONNX model next to the weights and returns its path. The model is
+    written under a temporary name and renamed into place once complete.
+    """
+    from onnxruntime import InferenceSession
+    from onnxruntime.quantization import (
+        QuantFormat, QuantType, quantize_dynamic, quantize_static
+    )
+
+    fp32_path = engines.ensure_exported(weights_path, "onnx", imgsz=imgsz)
+    int8_path = quantized_model_path(weights_path)
+    staged_path = f"{os.path.splitext(int8_path)[0]}.{os.getpid()}.tmp.onnx"
+
+    print(f"🔧 Quantising {fp32_path} to INT8 ({mode})...")
+    started = time.perf_counter()
+    try:
+        if mode == "dynamic":
+            quantize_dynamic(fp32_path, staged_path, weight_type=QuantType.QUInt8)
+        elif mode == "static":
+            if not calibration_dir:
+                raise ValueError("Static quantisation needs a calibration image folder.")
+            input_name = InferenceSession(fp32_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+            reader = FolderCalibrationReader(calibration_dir, input_name, imgsz)
+            quantize_static(
+                fp32_path, staged_path, reader,
+                quant_format=QuantFormat.QDQ,
+                activation_type=QuantType.QUInt8,
+                weight_type=QuantType.QInt8,
+            )
+        else:
+            raise ValueError(f"Unknown quantisation mode '{mode}'. Expected 'dynamic' or 'static'.")
+        os.replace(staged_path, int8_path)
+    finally:
+        if os.path.exists(staged_path):
+            os.remove(staged_path)
+    print(f"✅ INT8 model written to {int8_path} in {time.perf_counter() - started:.1f}s")
+    return int8_path
+
+
+def _box_iou(a: list, b: list) -> float:
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    intersection = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def detection_agreement(reference: list, candidate: list, iou_threshold: float = AGREEMENT_IOU) -> float:
+    """
+    F1-style agreement between two detection lists: greedy one-to-one matching of
+    same-label boxes with IoU >= iou_threshold. 1.0 means identical detections.
+    """
+    if not reference and not candidate:
+        return 1.0
+    unmatched = list(candidate)
+    matches = 0
+    for ref in sorted(reference, key=lambda d: d["confidence"], reverse=True):
+        best, best_iou = None, iou_threshold
+        for cand in unmatched:
+            if cand["label"] != ref["label"]:
+                continue
+            iou = _box_iou(ref["box"], cand["box"])
+            if iou >= best_iou:
+                best, best_iou = cand, iou
+        if best is not None:
+            unmatched.remove(best)
+            matches += 1
+    return 2 * matches / (len(reference) + len(candidate))
+
+
+def _timed_detections(model, image: np.ndarray) -> tuple:
+    started = time.perf_counter()
+    detections = detection.run_detection(model, image)
+    return detections, time.perf_counter() - started
+
+
+def compare_models(reference_model, int8_model, image_paths: list, warmup: int = 2) -> dict:
+    """
+    Runs both models on the same images and reports agreement, volume deltas and latency.
+    """
+    images = [img for img in (cv2.imread(p, cv2.IMREAD_COLOR) for p in image_paths) if img is not None]
+    if not images:
+        raise ValueError("No readable images to compare on.")
+    for _ in range(warmup):
+        detection.run_detection(reference_model, images[0])
+        detection.run_detection(int8_model, images[0])
+
+    agreements, volume_deltas, relative_deltas = [], [], []
+    reference_times, int8_times = [], []
+    for image in images:
+        reference_detections, reference_s = _timed_detections(reference_model, image)
+        int8_detections, int8_s = _timed_detections(int8_model, image)
+        reference_times.append(reference_s)
+        int8_times.append(int8_s)
+
+        agreements.append(detection_agreement(reference_detections, int8_detections))
+        reference_volume = reconstruction.estimate_volume_from_detections(reference_detections)
+        int8_volume = reconstruction.estimate_volume_from_detections(int8_detections)
+        volume_deltas.append(int8_volume - reference_volume)
+        if reference_volume > 0:
+            relative_deltas.append(abs(int8_volume - reference_volume) / reference_volume)
+
+    reference_ms = np.asarray(reference_times) * 1000
+    int8_ms = np.asarray(int8_times) * 1000
+    return {
+        "images": len(images),
+        "detection_agreement_mean": float(np.mean(agreements)),
+        "detection_agreement_min": float(np.min(agreements)),
+        "volume_delta_mean_cm3": float(np.mean(volume_deltas)),
+        "volume_delta_abs_mean_cm3": float(np.mean(np.abs(volume_deltas))),
+        "volume_delta_relative_mean": float(np.mean(relative_deltas)) if relative_deltas else None,
+        "reference_latency_p50_ms": float(np.percentile(reference_ms, 50)),
+        "int8_latency_p50_ms": float(np.percentile(int8_ms, 50)),
+        "speedup": float(reference_ms.mean() / int8_ms.mean()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and evaluate an INT8 variant of the waste model.")
+    parser.add_argument("--weights", default=ml_settings.MODEL_PATH, help="PyTorch weights to quantise.")
+    parser.add_argument("--mode", choices=["dynamic", "static"], default=ml_settings.QUANT_MODE)
+    parser.add_argument("--calibration-dir", default=ml_settings.QUANT_CALIBRATION_DIR,
+                        help="Image folder for static calibration.")
+    parser.add_argument("--images", default=None, help="Image folder for the comparison report (default: calibration dir).")
+    parser.add_argument("--reference", choices=["onnx", "torch"], default="onnx",
+                        help="FP32 model to compare against (onnx isolates the effect of quantisation).")
+    parser.add_argument("--imgsz", type=int, default=ml_settings.EXPORT_IMGSZ)
+    parser.add_argument("--report", default="ml/data/quantization_report.json")
+    parser.add_argument("--report-only", action="store_true", help="Reuse an existing INT8 model.")
+    args = parser.parse_args()
+
+    if not (args.report_only and os.path.exists(quantized_model_path(args.weights))):
+        # a worker building it on first use at the same time waits for this one
+        with engines.export_lock(quantized_model_path(args.weights)):
+            quantize_model(args.weights, mode=args.mode, calibration_dir=args.calibration_dir, imgsz=args.imgsz)
+
+    image_dir = args.images or args.calibration_dir
+    if not image_dir:
+        print("No image folder given; skipping the comparison report.")
+        return
+
+    reference_model = engines.load_model(args.reference, args.weights, imgsz=args.imgsz)
+    int8_model = engines.load_model("onnx-int8", args.weights, imgsz=args.imgsz)
+    report = compare_models(reference_model, int8_model, _list_images(image_dir))
+    report.update({"mode": args.mode, "reference": args.reference, "weights": args.weights})
+
+    os.makedirs(os.path.dirname(args.report) or ".", exist_ok=True)
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"📊 Agreement {report['detection_agreement_mean']:.3f}, "
+          f"mean |volume delta| {report['volume_delta_abs_mean_cm3']:.1f} cm³, "
+          f"speedup x{report['speedup']:.2f}")
+    print(f"Report saved to: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,115 @@
 # backend/ml/reconstruction.py
+import numpy as np
 
 # --- CONFIGURATION ---
 # These constants belong here as they are part of the reconstruction logic.
 PIXEL_TO_CM = 0.1      # Each pixel ~0.1 cm (adjust if calibration available)
 ASSUMED_HEIGHT_CM = 5  # Assume avg height of waste pile in cm
+# PIXEL_TO_CM is per pixel of the photo as taken. Uploads are downscaled at ingest, so
+# boxes measured on the stored image are scaled back up by pixel_scale (original
+# pixels per stored pixel) before converting to cm.
 
-def estimate_volume_from_detections(detection_results: list) -> float:
+def _as_xyxy_array(boxes) -> np.ndarray:
     """
-    Estimates 3D waste volume from a list of 2D bounding box detections.
+    Accepts a torch tensor (e.g. results[0].boxes.xyxy), a NumPy array or a nested
+    list and returns an (N, 4) float64 array.
+    """
+    if hasattr(boxes, "cpu"):
+        boxes = boxes.cpu().numpy()
+    return np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+
+def union_area(boxes) -> float:
+    """
+    Area covered by the union of axis-aligned boxes, so overlapping detections of
+    the same pile are only counted once.
+
+    Works on the compressed grid formed by all box edges: a 2D difference array
+    marks each box, a double cumulative sum gives per-cell coverage counts, and
+    the covered cells' areas are summed. Fully vectorised, O(N^2) cells at worst.
+    """
+    xyxy = _as_xyxy_array(boxes)
+    # drop degenerate / inverted boxes
+    xyxy = xyxy[(xyxy[:, 2] > xyxy[:, 0]) & (xyxy[:, 3] > xyxy[:, 1])]
+    if len(xyxy) == 0:
+        return 0.0
+
+    xs = np.unique(xyxy[:, [0, 2]])
+    ys = np.unique(xyxy[:, [1, 3]])
+    x1 = np.searchsorted(xs, xyxy[:, 0])
+    x2 = np.searchsorted(xs, xyxy[:, 2])
+    y1 = np.searchsorted(ys, xyxy[:, 1])
+    y2 = np.searchsorted(ys, xyxy[:, 3])
+
+    diff = np.zeros((len(xs), len(ys)), dtype=np.int32)
+    np.add.at(diff, (x1, y1), 1)
+    np.add.at(diff, (x2, y1), -1)
+    np.add.at(diff, (x1, y2), -1)
+    np.add.at(diff, (x2, y2), 1)
+    coverage = diff.cumsum(axis=0).cumsum(axis=1)[:-1, :-1]
+
+    cell_areas = np.outer(np.diff(xs), np.diff(ys))
+    return float(cell_areas[coverage > 0].sum())
+
+def _area_to_volume(area_pixels: float, pixel_scale: float = 1.0) -> float:
+    # Convert pixel area to real-world area (cm²), then extrude with the assumed height
+    return area_pixels * ((pixel_scale * PIXEL_TO_CM) ** 2) * ASSUMED_HEIGHT_CM
+
+def rescale_volume(volume_cm3: float, pixel_scale: float) -> float:
+    """
+    Converts a volume estimated at pixel_scale 1.0 to another pixel_scale (volume
+    grows with box area, i.e. with the square of the scale).
+    """
+    return volume_cm3 * pixel_scale ** 2
+
+def estimate_volume_from_boxes(boxes, labels=None, pixel_scale: float = 1.0) -> dict:
+    """
+    Estimates waste volume straight from an (N, 4) xyxy tensor/array.
 
     Args:
-        detection_results: A list of detection dictionaries from the detection module.
-                           Example: [{"box": [x1, y1, x2, y2], ...}, ...]
+        boxes: results[0].boxes.xyxy (torch tensor) or any (N, 4) array-like.
+        labels: Optional sequence of N class labels for the per-label breakdown.
+        pixel_scale: Original photo pixels per pixel of the image the boxes are in.
 
     Returns:
-        The estimated volume of waste in cubic centimeters (cm³).
+        {"total_cm3": float, "by_label": {label: float}}. Each label's volume is the
+        union of that label's boxes; the total is the union of all boxes, so where
+        different labels overlap the breakdown can sum to more than the total.
+    """
+    xyxy = _as_xyxy_array(boxes)
+    total = _area_to_volume(union_area(xyxy), pixel_scale)
+
+    by_label = {}
+    if labels is not None and len(xyxy):
+        labels = np.asarray(labels)
+        for label in np.unique(labels):
+            by_label[str(label)] = _area_to_volume(union_area(xyxy[labels == label]), pixel_scale)
+
+    return {"total_cm3": total, "by_label": by_label}
+
+def estimate_volume_breakdown(detection_results: list, pixel_scale: float = 1.0) -> dict:
+    """
+    Same as estimate_volume_from_boxes, for a list of detection dicts.
     """
-    total_area_pixels = 0
-    for detection in detection_results:
-        x1, y1, x2, y2 = detection["box"]
-        width_pixels = x2 - x1
-        height_pixels = y2 - y1
-        area_pixels = width_pixels * height_pixels
-        total_area_pixels += area_pixels
+    if not detection_results:
+        return {"total_cm3": 0.0, "by_label": {}}
+    boxes = [detection["box"] for detection in detection_results]
+    labels = [detection.get("label", "") for detection in detection_results]
+    return estimate_volume_from_boxes(boxes, labels, pixel_scale=pixel_scale)
 
-    # Convert total pixel area to real-world area (cm²)
-    total_area_cm2 = total_area_pixels * (PIXEL_TO_CM ** 2)
+def estimate_volume_from_detections(detection_results: list, pixel_scale: float = 1.0) -> float:
+    """
+    Estimates 3D waste volume from a list of 2D bounding box detections.
 
-    # Extrude the 2D area into a 3D volume using an assumed height
-    total_volume_cm3 = total_area_cm2 * ASSUMED_HEIGHT_CM
+    Args:
+        detection_results: A list of detection dictionaries from the detection module.
+                           Example: [{"box": [x1, y1, x2, y2], ...}, ...]
+        pixel_scale: Original photo pixels per pixel of the image the boxes are in.
 
-    return total_volume_cm3
\ No newline at end of file
+    Returns:
+        The estimated volume of waste in cubic centimeters (cm³), counting
+        overlapping boxes once.
+    """
+    if not detection_results:
+        return 0.0
+    boxes = [detection["box"] for detection in detection_results]
+    return _area_to_volume(union_area(boxes), pixel_scale)
@@ -0,0 +1,136 @@
+# backend/ml/registry.py
+"""
+Local model registry: a directory of versioned weights plus a manifest naming
+the active version. Workers watch the manifest and hot-swap to a newly
+activated version between tasks (see pipeline.start_registry_watcher).
+
+Layout:
+    <ML_REGISTRY_DIR>/manifest.json
+    <ML_REGISTRY_DIR>/<version>/best.pt      (exported ONNX / OpenVINO / INT8 files land next to it)
+
+manifest.json:
+    {"active": "v3", "versions": {"v3": {"weights": "v3/best.pt", "registered_at": "...", "notes": "..."}}}
+
+Usage (from backend/):
+    python -m ml.registry list
+    python -m ml.registry register v4 /path/to/best.pt --notes "retrained on Oct data"
+    python -m ml.registry activate v4
+"""
+import os
+import json
+import shutil
+import argparse
+from datetime import datetime, timezone
+
+from .config import ml_settings
+
+MANIFEST_NAME = "manifest.json"
+WEIGHTS_NAME = "best.pt"
+
+
+def manifest_path(registry_dir: str = ml_settings.REGISTRY_DIR) -> str:
+    return os.path.join(registry_dir, MANIFEST_NAME)
+
+
+def enabled(registry_dir: str = ml_settings.REGISTRY_DIR) -> bool:
+    return bool(registry_dir) and os.path.exists(manifest_path(registry_dir))
+
+
+def read_manifest(registry_dir: str = ml_settings.REGISTRY_DIR) -> dict:
+    path = manifest_path(registry_dir)
+    if not os.path.exists(path):
+        return {"active": None, "versions": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def manifest_mtime(registry_dir: str = ml_settings.REGISTRY_DIR) -> float | None:
+    try:
+        return os.path.getmtime(manifest_path(registry_dir))
+    except OSError:
+        return None
+
+
+def _write_manifest(manifest: dict, registry_dir: str):
+    # write-then-rename so watchers never read a half-written manifest
+    os.makedirs(registry_dir, exist_ok=True)
+    tmp_path = manifest_path(registry_dir) + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path(registry_dir))
+
+
+def active_version(registry_dir: str = ml_settings.REGISTRY_DIR) -> tuple:
+    """
+    Returns (version, absolute weights path) for the active version, or (None, None).
+    """
+    manifest = read_manifest(registry_dir)
+    version = manifest.get("active")
+    if not version or version not in manifest.get("versions", {}):
+        return None, None
+    weights = manifest["versions"][version]["weights"]
+    return version, os.path.join(registry_dir, weights)
+
+
+def register(version: str, weights_source: str, notes: str = "", registry_dir: str = ml_settings.REGISTRY_DIR) -> str:
+    """
+    Copies weights into the registry under a new version (without activating it).
+    """
+    manifest = read_manifest(registry_dir)
+    if version in manifest["versions"]:
+        raise ValueError(f"Model version '{version}' is already registered.")
+
+    version_dir = os.path.join(registry_dir, version)
+    os.makedirs(version_dir, exist_ok=True)
+    shutil.copy2(weights_source, os.path.join(version_dir, WEIGHTS_NAME))
+
+    manifest["versions"][version] = {
+        "weights": f"{version}/{WEIGHTS_NAME}",
+        "registered_at": datetime.now(timezone.utc).isoformat(),
+        "notes": notes,
+    }
+    _write_manifest(manifest, registry_dir)
+    return version
+
+
+def activate(version: str, registry_dir: str = ml_settings.REGISTRY_DIR):
+    manifest = read_manifest(registry_dir)
+    if version not in manifest["versions"]:
+        raise ValueError(f"Unknown model version '{version}'.")
+    manifest["active"] = version
+    manifest["activated_at"] = datetime.now(timezone.utc).isoformat()
+    _write_manifest(manifest, registry_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local model registry.")
+    parser.add_argument("--registry-dir", default=ml_settings.REGISTRY_DIR)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="Show registered versions.")
+    register_parser = subparsers.add_parser("register", help="Add a new version.")
+    register_parser.add_argument("version")
+    register_parser.add_argument("weights")
+    register_parser.add_argument("--notes", default="")
+    register_parser.add_argument("--activate", action="store_true")
+    activate_parser = subparsers.add_parser("activate", help="Make a version active on all workers.")
+    activate_parser.add_argument("version")
+    args = parser.parse_args()
+
+    if args.command == "register":
+        register(args.version, args.weights, notes=args.notes, registry_dir=args.registry_dir)
+        print(f"✅ Registered model version '{args.version}'.")
+        if args.activate:
+            activate(args.version, registry_dir=args.registry_dir)
+            print(f"🚀 Activated '{args.version}'.")
+    elif args.command == "activate":
+        activate(args.version, registry_dir=args.registry_dir)
+        print(f"🚀 Activated '{args.version}'. Workers will switch over after warming it up.")
+    else:
+        manifest = read_manifest(args.registry_dir)
+        for version, info in manifest["versions"].items():
+            marker = "*" if version == manifest.get("active") else " "
+            print(f"{marker} {version:<12} {info['registered_at']}  {info.get('notes', '')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -24,9 +24,10 @@ class Settings(BaseSettings):
     
     # redis
     REDIS_URL: str
-    CLOUDINARY_CLOUD_NAME: str
-    CLOUDINARY_API_KEY: str
-    CLOUDINARY_API_SECRET: str
+    # only needed with STORAGE_BACKEND="cloudinary"
+    CLOUDINARY_CLOUD_NAME: Optional[str] = None
+    CLOUDINARY_API_KEY: Optional[str] = None
+    CLOUDINARY_API_SECRET: Optional[str] = None
 
     class Config:
         env_file = ".env"